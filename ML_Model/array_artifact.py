@@ -0,0 +1,221 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import joblib
+import numpy as np
+
+from compiled_model import compile_model, predict_compiled
+
+ARTIFACT_FORMAT = "churn-model-arrays"
+ARTIFACT_FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+# Array directories kept per artifact: the current one and the one before it,
+# which readers that loaded the previous manifest may still have mapped
+KEEP_VERSIONS = 2
+
+
+def artifact_dir_for(pkl_path):
+    """improved_churn_model.pkl -> improved_churn_model.model"""
+    return os.path.splitext(pkl_path)[0] + ".model"
+
+
+def save_artifact(model_package, out_dir):
+    """Write a model package as a JSON manifest plus one .npy file per array
+
+    Arrays are the compiled model from compiled_model.compile_model, plus the
+    raw scaler parameters when the package has a scaler. The version is a hash
+    of every array's bytes and the manifest fields, so identical models get
+    identical versions whatever sklearn wrote them.
+
+    Files that readers may have mapped are never rewritten: the arrays go to a
+    new v-<version> subdirectory, and replacing the manifest, which names that
+    subdirectory, publishes them atomically.
+    """
+    compiled = compile_model(model_package)
+    scaler = model_package.get("scaler")
+    if scaler is not None:
+        compiled["scaler_mean"] = np.asarray(scaler.mean_, dtype=np.float64)
+        compiled["scaler_scale"] = np.asarray(scaler.scale_, dtype=np.float64)
+
+    os.makedirs(out_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".staging-", dir=out_dir)
+    try:
+        digest = hashlib.blake2b(digest_size=8)
+        arrays = {}
+        fields = {}
+        for name, value in sorted(compiled.items()):
+            if not isinstance(value, np.ndarray):
+                fields[name] = value
+                continue
+            file_name = f"{name}.npy"
+            # Contiguous, so np.load can map it straight into memory
+            np.save(os.path.join(staging, file_name), np.ascontiguousarray(value))
+            arrays[name] = {
+                "file": file_name,
+                "dtype": value.dtype.str,
+                "shape": list(value.shape),
+            }
+            digest.update(name.encode())
+            digest.update(np.ascontiguousarray(value).tobytes())
+
+        manifest = {
+            "format": ARTIFACT_FORMAT,
+            "format_version": ARTIFACT_FORMAT_VERSION,
+            **fields,
+            "feature_thresholds": model_package.get("feature_thresholds"),
+            "segment_encoding": model_package.get("segment_encoding"),
+            "arrays": arrays,
+        }
+        digest.update(json.dumps(manifest, sort_keys=True).encode())
+        manifest["version"] = digest.hexdigest()
+        manifest["directory"] = f"v-{manifest['version']}"
+
+        # mkdtemp creates the directory 0700; publish it like an ordinary one
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(staging, 0o755 & ~umask)
+
+        target = os.path.join(out_dir, manifest["directory"])
+        if os.path.isdir(target):
+            # The same arrays are already published
+            shutil.rmtree(staging)
+        else:
+            os.replace(staging, target)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    try:
+        previous = load_manifest(out_dir).get("directory")
+    except (FileNotFoundError, ValueError):
+        previous = None
+
+    # Manifest last: swapping it is what switches readers to the new arrays
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+    _prune_versions(out_dir, keep={manifest["directory"], previous})
+    return manifest
+
+
+def _prune_versions(out_dir, keep):
+    """Delete array directories beyond the KEEP_VERSIONS most recent ones
+
+    Unlinking is safe even for a mapped file: its pages stay valid until the
+    reader unmaps them; only rewriting a file in place would break readers.
+    """
+    versions = sorted(
+        (
+            entry
+            for entry in os.scandir(out_dir)
+            if entry.is_dir() and entry.name.startswith("v-")
+        ),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True,
+    )
+    for entry in versions[KEEP_VERSIONS:]:
+        if entry.name not in keep:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def load_manifest(artifact_dir):
+    with open(os.path.join(artifact_dir, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != ARTIFACT_FORMAT:
+        raise ValueError(f"{artifact_dir} is not a churn model artifact")
+    if manifest["format_version"] > ARTIFACT_FORMAT_VERSION:
+        raise ValueError(
+            f"{artifact_dir} uses format version {manifest['format_version']}, "
+            f"this loader reads up to {ARTIFACT_FORMAT_VERSION}"
+        )
+    return manifest
+
+
+def load_artifact(artifact_dir, mmap=True):
+    """The compiled model of an artifact, ready for predict_compiled
+
+    With mmap the arrays are read-only memory maps: loading touches no array
+    data, and worker processes mapping the same files share their pages.
+    Arrays are read from the directory the manifest names, so a load sees
+    one complete version even while a new one is being saved.
+    """
+    manifest = load_manifest(artifact_dir)
+    compiled = {
+        name: value
+        for name, value in manifest.items()
+        if name not in ("format", "format_version", "arrays", "directory")
+    }
+    # Artifacts written before versioned directories keep arrays alongside
+    array_dir = os.path.join(artifact_dir, manifest.get("directory", ""))
+    for name, spec in manifest["arrays"].items():
+        array = np.load(
+            os.path.join(array_dir, spec["file"]),
+            mmap_mode="r" if mmap else None,
+            allow_pickle=False,
+        )
+        if array.dtype.str != spec["dtype"] or list(array.shape) != spec["shape"]:
+            raise ValueError(f"{spec['file']} does not match the manifest")
+        compiled[name] = array
+    return compiled
+
+
+def convert_pickle(pkl_path, out_dir=None):
+    """Convert an existing joblib model package to the array artifact format"""
+    out_dir = out_dir or artifact_dir_for(pkl_path)
+    manifest = save_artifact(joblib.load(pkl_path), out_dir)
+    print(
+        f"✅ Converted {pkl_path} -> {out_dir} "
+        f"({manifest['model_type']}, version {manifest['version']})"
+    )
+    return out_dir
+
+
+def compare_cold_start(pkl_path, artifact_dir, rows=1000):
+    """Load time of the pickle vs the mapped artifact, and their score parity"""
+    start = time.perf_counter()
+    model_package = joblib.load(pkl_path)
+    pickle_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    compiled = load_artifact(artifact_dir)
+    artifact_seconds = time.perf_counter() - start
+
+    X = np.random.default_rng(0).gamma(2.0, 50.0, (rows, compiled["n_features"]))
+    difference = np.max(
+        np.abs(
+            predict_compiled(compiled, X)
+            - predict_compiled(compile_model(model_package), X)
+        )
+    )
+    print(
+        f"⏱️ Cold start: joblib {pickle_seconds * 1000:.1f} ms, "
+        f"mmap artifact {artifact_seconds * 1000:.1f} ms"
+    )
+    print(f"🔍 Max score difference: {difference:.2e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert a joblib churn model to the memory-mappable format"
+    )
+    parser.add_argument("--model", default="improved_churn_model.pkl")
+    parser.add_argument("--out-dir", help="defaults to the model name with .model")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+    out_dir = convert_pickle(args.model, args.out_dir)
+    compare_cold_start(args.model, out_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import argparse
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import joblib
+from snowflake.snowpark import Session
+from snowflake_config import SNOWFLAKE_CONFIG
+from feature_registry import SEGMENT_ENCODING, feature_exprs_sql
+from deploy_model_udf import (
+    METADATA_TABLE,
+    feature_args_sql,
+    feature_thresholds,
+    load_model_metadata,
+)
+from model_artifact import model_version
+from sql_export import model_inputs_sql, model_sql
+
+PREDICTIONS_TABLE = "ML_MODELS.CHURN_PREDICTIONS"
+PREDICTIONS_VIEW = "ML_MODELS.CUSTOMER_CHURN_PREDICTIONS"
+
+
+def create_session():
+    return Session.builder.configs(SNOWFLAKE_CONFIG).create()
+
+
+def latest_model_version(session):
+    """Version of the most recently deployed model, from the metadata table"""
+    rows = session.sql(f"""
+        SELECT model_version FROM {METADATA_TABLE}
+        ORDER BY created_at DESC
+        LIMIT 1
+        """).collect()
+    if not rows:
+        raise RuntimeError(f"No deployed model recorded in {METADATA_TABLE}")
+    return rows[0]["MODEL_VERSION"]
+
+
+def _feature_hash_sql(thresholds, segment_encoding, alias):
+    """Hash of exactly the values the model sees, so any change re-scores"""
+    exprs = feature_exprs_sql(thresholds, segment_encoding, alias)
+    return f"HASH({', '.join(expr for _, expr in exprs)})"
+
+
+def _changed_features_sql(version, thresholds, segment_encoding, columns):
+    """The given columns for users that are new, changed or scored by another model"""
+    return f"""
+            SELECT
+                f.user_id,
+                {_feature_hash_sql(thresholds, segment_encoding, "f")} AS feature_hash,
+                {columns}
+            FROM FEATURES.USER_FEATURES f
+            LEFT JOIN {PREDICTIONS_TABLE} s ON f.user_id = s.user_id
+            WHERE s.user_id IS NULL
+            OR s.model_version <> '{version}'
+            OR s.feature_hash <> {_feature_hash_sql(thresholds, segment_encoding, "f")}
+    """
+
+
+def _score_changed_query(version, thresholds, segment_encoding, score_sql=None):
+    """MERGE fresh scores for users that are new, changed or scored by another model
+
+    With score_sql (from sql_export.model_sql) the scores are computed in
+    plain SQL over the model inputs instead of by the batch UDF.
+    """
+    if score_sql is None:
+        columns = f"""predict_churn_batch({feature_args_sql(thresholds, segment_encoding, "f")}
+                ) AS churn_score"""
+        scored = f"""
+        SELECT
+            user_id,
+            feature_hash,
+            churn_score:probability::FLOAT AS churn_probability,
+            churn_score:label::BOOLEAN AS churn_prediction
+        FROM ({_changed_features_sql(version, thresholds, segment_encoding, columns)})
+        """
+    else:
+        columns = ",\n                ".join(
+            model_inputs_sql(thresholds, segment_encoding, "f")
+        )
+        scored = f"""
+        SELECT
+            user_id,
+            feature_hash,
+            churn_probability,
+            churn_probability > 0.5 AS churn_prediction
+        FROM (
+            SELECT user_id, feature_hash, {score_sql} AS churn_probability
+            FROM ({_changed_features_sql(version, thresholds, segment_encoding, columns)})
+        )
+        """
+    return f"""
+    MERGE INTO {PREDICTIONS_TABLE} p
+    USING ({scored}) n
+    ON p.user_id = n.user_id
+    WHEN MATCHED THEN UPDATE SET
+        p.churn_probability = n.churn_probability,
+        p.churn_prediction = n.churn_prediction,
+        p.feature_hash = n.feature_hash,
+        p.model_version = '{version}',
+        p.scored_at = CURRENT_TIMESTAMP()
+    WHEN NOT MATCHED THEN INSERT (
+        user_id, churn_probability, churn_prediction, feature_hash,
+        model_version, scored_at
+    ) VALUES (
+        n.user_id, n.churn_probability, n.churn_prediction, n.feature_hash,
+        '{version}', CURRENT_TIMESTAMP()
+    )
+    """
+
+
+def score_churn_predictions(
+    session, version, thresholds, segment_encoding, score_sql=None
+):
+    """Bring the predictions table up to date with USER_FEATURES and the model
+
+    Only users whose model inputs changed since they were last scored, or who
+    were scored by a different model version, go through the UDF; everyone
+    else keeps their stored score. Returns the number of users re-scored.
+    score_sql scores in plain SQL instead of through the batch UDF.
+    """
+    session.sql(f"""
+        CREATE TABLE IF NOT EXISTS {PREDICTIONS_TABLE} (
+            user_id INTEGER,
+            churn_probability FLOAT,
+            churn_prediction BOOLEAN,
+            feature_hash NUMBER,
+            model_version STRING,
+            scored_at TIMESTAMP
+        )
+        """).collect()
+
+    print(f"🎯 Scoring changed users with model version {version}...")
+    merged = session.sql(
+        _score_changed_query(version, thresholds, segment_encoding, score_sql)
+    ).collect()[0]
+    rescored = merged[0] + merged[1]
+
+    # Users dropped from USER_FEATURES should not keep a stale score
+    session.sql(f"""
+        DELETE FROM {PREDICTIONS_TABLE}
+        WHERE user_id NOT IN (SELECT user_id FROM FEATURES.USER_FEATURES)
+        """).collect()
+
+    print(f"✅ Re-scored {rescored} users into {PREDICTIONS_TABLE}")
+    return rescored
+
+
+def create_predictions_view(session):
+    """Predictions joined to their features; reading it runs no UDFs"""
+    session.sql(f"""
+        CREATE OR REPLACE VIEW {PREDICTIONS_VIEW} AS
+        SELECT
+            f.*,
+            p.churn_probability,
+            p.churn_prediction,
+            p.model_version,
+            p.scored_at
+        FROM FEATURES.USER_FEATURES f
+        JOIN {PREDICTIONS_TABLE} p ON f.user_id = p.user_id
+        """).collect()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh stored churn scores")
+    parser.add_argument(
+        "--sql",
+        action="store_true",
+        help="score in plain SQL compiled from the local model, with no UDF",
+    )
+    parser.add_argument("--model", default="improved_churn_model.pkl")
+    parser.add_argument("--max-depth", type=int, help="cut forest trees at this depth")
+    parser.add_argument("--max-trees", type=int, help="keep only this many trees")
+    args = parser.parse_args(argv)
+
+    session = create_session()
+
+    try:
+        if args.sql:
+            model_package = joblib.load(args.model)
+            # Older packages lack thresholds; compute them like deployment does
+            thresholds = feature_thresholds(session, model_package)
+            segment_encoding = model_package.get("segment_encoding", SEGMENT_ENCODING)
+            score_sql = model_sql(model_package, None, args.max_depth, args.max_trees)
+            version = f"{model_version(args.model)}-sql"
+            # Capped exports are a different model, so they get their own version
+            if args.max_depth is not None or args.max_trees is not None:
+                version += f"-d{args.max_depth}-t{args.max_trees}"
+        else:
+            version = latest_model_version(session)
+            thresholds, segment_encoding = load_model_metadata(session, version)
+            score_sql = None
+        score_churn_predictions(
+            session, version, thresholds, segment_encoding, score_sql
+        )
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import numpy as np
+
+
+def model_scaler(model_package):
+    """The scaler to apply before predict_proba, or None
+
+    Training stores a scaler only for models fitted on standardized features
+    (tree models get None), so any stored scaler is applied.
+    """
+    return model_package.get("scaler")
+
+
+def score_row(model, scaler, values):
+    """Score one row the way the scalar UDF does: one predict_proba per call"""
+    try:
+        features = np.array([[float(value or 0) for value in values]])
+        if scaler is not None:
+            features = scaler.transform(features)
+        return float(model.predict_proba(features)[:, 1][0])
+    except Exception:
+        return 0.5
+
+
+def score_batch(model, scaler, features):
+    """Score a whole batch with a single predict_proba call
+
+    features is any 2-D array-like in feature_columns order (a pandas batch in
+    a vectorized UDF); missing values are scored as 0 like the scalar path.
+    """
+    features = np.nan_to_num(np.asarray(features, dtype=np.float64), nan=0.0)
+    if scaler is not None:
+        features = scaler.transform(features)
+    return model.predict_proba(features)[:, 1]
@@ -0,0 +1,304 @@
+import argparse
+import os
+import pickle
+import sys
+import time
+import warnings
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import joblib
+import numpy as np
+
+from churn_scoring import model_scaler, score_batch
+from udf_benchmark import load_feature_matrix
+
+FOREST_BLOCK_SIZE = 512
+# Largest trees x 2**depth for which predict_forest uses the level layout
+MAX_LEVEL_SLOTS = 1 << 22
+# Batches up to this size score faster compiled than with sklearn's
+# predict_proba. Measured on one core, a 200-tree depth-10 forest was 4x
+# faster at 256 rows, 1.5x at 1024 and 0.5x at 4096; the bundled 100-tree
+# depth-19 model 5.7x, 1.1x and 0.6x. Multi-threaded sklearn crosses
+# over earlier, so larger batches go to sklearn when the model is available.
+COMPILED_MAX_BATCH = 1024
+
+
+def float32_at_most(values):
+    """Largest float32 not above each float64 value
+
+    sklearn trees compare float32 inputs against float64 thresholds, and for a
+    float32 x, x <= t exactly when x <= the largest float32 at most t. Rounding
+    toward -inf therefore keeps every split decision identical.
+    """
+    rounded = values.astype(np.float32)
+    too_high = rounded.astype(np.float64) > values
+    rounded[too_high] = np.nextafter(rounded[too_high], np.float32(-np.inf))
+    return rounded
+
+
+def compile_forest(forest):
+    """Flatten every tree of a fitted forest into shared contiguous node arrays
+
+    Nodes of all trees are concatenated; roots[i] is the first node of tree i
+    and children[node] holds its (left, right) node. Leaves point to themselves
+    on both sides, so every row can take exactly depth steps without checking
+    whether it has already reached a leaf.
+    """
+    children, feature, threshold, leaf_value, roots = [], [], [], [], []
+    offset = 0
+    depth = 0
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        nodes = np.arange(tree.node_count)
+        is_leaf = tree.children_left == -1
+        children.append(
+            np.stack(
+                [
+                    np.where(is_leaf, nodes, tree.children_left),
+                    np.where(is_leaf, nodes, tree.children_right),
+                ],
+                axis=1,
+            )
+            + offset
+        )
+        feature.append(np.where(is_leaf, 0, tree.feature))
+        threshold.append(float32_at_most(np.where(is_leaf, 0.0, tree.threshold)))
+        # Class counts in older sklearn, fractions in newer: normalize both
+        value = tree.value[:, 0, :]
+        leaf_value.append(value[:, 1] / value.sum(axis=1))
+        roots.append(offset)
+        offset += tree.node_count
+        depth = max(depth, tree.max_depth)
+
+    n_features = forest.n_features_in_
+    return {
+        "kind": "forest",
+        "n_features": n_features,
+        "depth": depth,
+        "roots": np.array(roots, dtype=np.int32),
+        "children": np.concatenate(children).astype(np.int32),
+        "feature": np.concatenate(feature).astype(np.min_scalar_type(n_features)),
+        "threshold": np.concatenate(threshold),
+        "leaf_value": np.concatenate(leaf_value),
+    }
+
+
+def compile_linear(model, scaler=None):
+    """Fold the scaler into the LogisticRegression weights
+
+    ((x - mean) / scale) . w + b  ==  x . (w / scale) + (b - mean . (w / scale))
+    """
+    weights = model.coef_[0].astype(np.float64)
+    intercept = float(model.intercept_[0])
+    if scaler is not None:
+        weights = weights / scaler.scale_
+        intercept -= float(np.dot(scaler.mean_, weights))
+    return {
+        "kind": "linear",
+        "n_features": len(weights),
+        "weights": weights,
+        "intercept": np.array([intercept]),
+    }
+
+
+def compile_model(model_package):
+    """Compiled arrays for a model package, plus its feature columns"""
+    model = model_package["model"]
+    if hasattr(model, "estimators_"):
+        compiled = compile_forest(model)
+    elif hasattr(model, "coef_"):
+        compiled = compile_linear(model, model_scaler(model_package))
+    else:
+        raise ValueError(f"Cannot compile a {type(model).__name__}")
+    compiled["feature_columns"] = list(model_package["feature_columns"])
+    compiled["model_type"] = model_package["model_type"]
+    return compiled
+
+
+def level_layout(compiled):
+    """Per-level node arrays of every tree, padded to complete binary trees
+
+    Slot i of level l holds the node reached by the left/right turns in the
+    bits of i, so a row's next slot is 2 * slot + go_right and no child
+    lookup is needed. Leaves already point to themselves on both sides,
+    which pads shallow branches. Returns None when the padded trees would
+    not fit in MAX_LEVEL_SLOTS.
+    """
+    roots = compiled["roots"]
+    if len(roots) << compiled["depth"] > MAX_LEVEL_SLOTS:
+        return None
+    children = compiled["children"]
+    nodes = roots.astype(np.intp)[:, None]
+    features, thresholds = [], []
+    for _ in range(compiled["depth"]):
+        features.append(compiled["feature"][nodes].ravel())
+        thresholds.append(compiled["threshold"][nodes].ravel())
+        nodes = children[nodes].reshape(len(roots), -1)
+    return {
+        "features": features,
+        "thresholds": thresholds,
+        "leaf_value": compiled["leaf_value"][nodes].ravel(),
+    }
+
+
+def with_level_layout(compiled):
+    """The compiled model plus its level layout, for repeated forest scoring"""
+    if compiled["kind"] != "forest":
+        return compiled
+    return dict(compiled, levels=level_layout(compiled))
+
+
+def _walk_levels(levels, flat, row_offsets, n_trees):
+    # Slots of level l for tree t start at t * 2**l, so the slot of the next
+    # level is always twice this one plus the turn taken
+    slot = np.broadcast_to(
+        np.arange(n_trees, dtype=np.intp), (len(row_offsets), n_trees)
+    )
+    for feature, threshold in zip(levels["features"], levels["thresholds"]):
+        go_right = flat[row_offsets + feature[slot]] > threshold[slot]
+        slot = 2 * slot + go_right
+    return levels["leaf_value"][slot]
+
+
+def _walk_nodes(compiled, flat, row_offsets):
+    # Only (row, tree) pairs still at a split take the next step, so the cost
+    # follows the actual path lengths rather than the deepest tree
+    children = compiled["children"].ravel()
+    is_leaf = compiled["children"][:, 0] == np.arange(len(compiled["children"]))
+    feature, threshold = compiled["feature"], compiled["threshold"]
+    roots = compiled["roots"]
+    node = np.tile(roots.astype(np.intp), len(row_offsets))
+    offsets = np.repeat(row_offsets.ravel(), len(roots))
+    active = np.flatnonzero(~is_leaf[node])
+    while len(active):
+        current = node[active]
+        go_right = flat[offsets[active] + feature[current]] > threshold[current]
+        node[active] = following = children[2 * current + go_right]
+        active = active[~is_leaf[following]]
+    return compiled["leaf_value"][node].reshape(len(row_offsets), len(roots))
+
+
+def predict_forest(compiled, X, block_size=FOREST_BLOCK_SIZE):
+    """Walk all trees for a block of rows at once, one tree level per step
+
+    Rows are taken block_size at a time so the (rows, trees) indices stay in
+    cache. With a level layout (see with_level_layout) each step is two table
+    lookups and a shift for every pair. Otherwise it follows the child
+    arrays, where going right is child 1, and drops pairs that reached a
+    leaf, which suits deep, sparse trees.
+    """
+    X = X.astype(np.float32)
+    levels = compiled.get("levels")
+    n_features = X.shape[1]
+    probabilities = np.empty(len(X))
+    for start in range(0, len(X), block_size):
+        block = X[start : start + block_size]
+        flat = block.ravel()
+        row_offsets = (np.arange(len(block), dtype=np.intp) * n_features)[:, None]
+        if levels is not None:
+            leaf_value = _walk_levels(levels, flat, row_offsets, len(compiled["roots"]))
+        else:
+            leaf_value = _walk_nodes(compiled, flat, row_offsets)
+        probabilities[start : start + len(block)] = leaf_value.mean(axis=1)
+    return probabilities
+
+
+def predict_linear(compiled, X):
+    z = X @ compiled["weights"] + compiled["intercept"][0]
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+def predict_compiled(compiled, features):
+    """Churn probabilities, with the same missing-value handling as score_batch"""
+    X = np.nan_to_num(np.asarray(features, dtype=np.float64), nan=0.0)
+    if compiled["kind"] == "forest":
+        return predict_forest(compiled, X)
+    return predict_linear(compiled, X)
+
+
+def compiled_nbytes(compiled):
+    return sum(
+        value.nbytes for value in compiled.values() if isinstance(value, np.ndarray)
+    )
+
+
+def check_compiled(model_package, compiled, X):
+    """Largest absolute difference from sklearn's predict_proba"""
+    expected = score_batch(model_package["model"], model_scaler(model_package), X)
+    return float(np.max(np.abs(predict_compiled(compiled, X) - expected)))
+
+
+def hybrid_scorer(model_package, compiled, max_batch=COMPILED_MAX_BATCH):
+    """Score batches up to max_batch compiled and larger ones with sklearn"""
+    compiled = with_level_layout(compiled)
+    model = model_package["model"]
+    scaler = model_scaler(model_package)
+
+    def score(features):
+        if len(features) > max_batch:
+            return score_batch(model, scaler, features)
+        return predict_compiled(compiled, features)
+
+    return score
+
+
+def seconds_per_call(score, X, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        score(X)
+    return (time.perf_counter() - start) / repeats
+
+
+def benchmark_compiled(model_package, compiled, X, batch_sizes=(1, 16, 256, 4096)):
+    model = model_package["model"]
+    scaler = model_scaler(model_package)
+    sklearn_bytes = len(pickle.dumps(model)) + len(pickle.dumps(scaler))
+
+    print(
+        f"🔍 Max |compiled - sklearn|: {check_compiled(model_package, compiled, X):.2e}"
+    )
+    print(
+        f"💾 Model size: sklearn {sklearn_bytes / 1e6:.2f} MB, "
+        f"compiled {compiled_nbytes(compiled) / 1e6:.2f} MB "
+        f"({sklearn_bytes / compiled_nbytes(compiled):.1f}x smaller)"
+    )
+    compiled = with_level_layout(compiled)
+    print("⏱️ Latency per batch:")
+    for batch_size in batch_sizes:
+        batch = X[:batch_size]
+        repeats = max(3, 2000 // batch_size)
+        sklearn_time = seconds_per_call(
+            lambda rows: score_batch(model, scaler, rows), batch, repeats
+        )
+        compiled_time = seconds_per_call(
+            lambda rows: predict_compiled(compiled, rows), batch, repeats
+        )
+        print(
+            f"   batch {batch_size:<6} sklearn {sklearn_time * 1000:8.3f} ms  "
+            f"compiled {compiled_time * 1000:8.3f} ms  "
+            f"({sklearn_time / compiled_time:.1f}x)"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compile a churn model to flat NumPy arrays and check parity"
+    )
+    parser.add_argument("--model", default="improved_churn_model.pkl")
+    parser.add_argument("--features", help="CSV/Parquet file with feature columns")
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument(
+        "--batch-sizes", type=int, nargs="+", default=[1, 16, 256, 4096]
+    )
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+    model_package = joblib.load(args.model)
+    compiled = compile_model(model_package)
+    X = load_feature_matrix(args.features, compiled["feature_columns"], args.rows)
+    print(f"✅ Compiled {compiled['model_type']} ({compiled['kind']})")
+    benchmark_compiled(model_package, compiled, X, args.batch_sizes)
+
+
+if __name__ == "__main__":
+    main()
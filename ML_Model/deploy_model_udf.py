@@ -1,34 +1,161 @@
 import sys
 import os
+import shutil
+import tempfile
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from snowflake.snowpark import Session
 from snowflake.snowpark.functions import udf, col
-from snowflake.snowpark.types import FloatType, BooleanType
+from snowflake.snowpark.types import (
+    FloatType,
+    BooleanType,
+    PandasDataFrameType,
+    PandasSeriesType,
+    VariantType,
+)
 import joblib
-import numpy as np
 import pandas as pd
 from snowflake_config import SNOWFLAKE_CONFIG
+from churn_scoring import score_batch, score_row
+from feature_registry import (
+    SEGMENT_ENCODING,
+    feature_exprs_sql,
+    fit_feature_thresholds_sql,
+)
+from model_artifact import (
+    MODEL_STAGE_DIR,
+    load_model_and_scaler,
+    model_version,
+    versioned_file_name,
+)
 
+UDF_PACKAGES = ["scikit-learn==1.3.0", "numpy==1.26.4", "pandas==2.0.3"]
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+# Shipped with every UDF so the scoring helpers import inside the sandbox
+SCORING_MODULES = [
+    os.path.join(MODEL_DIR, "churn_scoring.py"),
+    os.path.join(MODEL_DIR, "model_artifact.py"),
+]
+UDF_BATCH_SIZE = 4096
+METADATA_TABLE = "ML_MODELS.MODEL_METADATA"
 
-def deploy_improved_churn_model():
-    print("🚀 Starting model deployment...")
-    try:
-        session = Session.builder.configs(SNOWFLAKE_CONFIG).create()
+
+def feature_args_sql(thresholds, segment_encoding=SEGMENT_ENCODING, alias=""):
+    """The 12 UDF arguments, in feature_columns order, as SQL expressions"""
+    exprs = feature_exprs_sql(thresholds, segment_encoding, alias)
+    return "".join(f"\n                {expr}," for _, expr in exprs).rstrip(",")
+
+
+def feature_thresholds(session, model_package):
+    """Thresholds saved with the model package
+
+    Packages trained before they were saved fall back to the warehouse
+    quantiles, computed once at deploy time rather than inside every query.
+    """
+    if "feature_thresholds" in model_package:
+        return model_package["feature_thresholds"]
+
+    print("⚠️ Model package has no saved thresholds, computing them once...")
+    return fit_feature_thresholds_sql(session)
+
+
+def save_model_metadata(session, version, model_type, thresholds, segment_encoding):
+    """Record the scoring constants of a deployed model version"""
+    session.sql(f"""
+        CREATE TABLE IF NOT EXISTS {METADATA_TABLE} (
+            model_version STRING,
+            model_type STRING,
+            name STRING,
+            value FLOAT,
+            created_at TIMESTAMP
+        )
+        """).collect()
+    rows = [("threshold", column, value) for column, value in thresholds.items()]
+    rows += [("segment", segment, code) for segment, code in segment_encoding.items()]
+    # Bound rather than inlined, so a NULL or NaN value is stored as one
+    placeholders = ",\n            ".join(
+        "(?, ?, ?, ?, CURRENT_TIMESTAMP())" for _ in rows
+    )
+    params = []
+    for kind, name, value in rows:
+        params += [
+            version,
+            model_type,
+            f"{kind}:{name}",
+            None if value is None else float(value),
+        ]
+    session.sql(
+        f"DELETE FROM {METADATA_TABLE} WHERE model_version = ?", params=[version]
+    ).collect()
+    session.sql(
+        f"""
+        INSERT INTO {METADATA_TABLE} (model_version, model_type, name, value, created_at)
+        VALUES
+            {placeholders}
+        """,
+        params=params,
+    ).collect()
+
+
+def load_model_metadata(session, version):
+    """(thresholds, segment_encoding) recorded for a deployed model version"""
+    rows = session.sql(
+        f"SELECT name, value FROM {METADATA_TABLE} WHERE model_version = ?",
+        params=[version],
+    ).collect()
+    thresholds, segment_encoding = {}, {}
+    for row in rows:
+        kind, name = row["NAME"].split(":", 1)
+        if kind == "threshold":
+            thresholds[name] = row["VALUE"]
+        else:
+            segment_encoding[name] = int(row["VALUE"])
+    return thresholds, segment_encoding
+
+
+def stage_model_artifact(session, path="improved_churn_model.pkl"):
+    """Upload the model under a content-versioned name; returns (file name, version)"""
+    version = model_version(path)
+    file_name = versioned_file_name(path, version)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        staged_copy = os.path.join(tmp_dir, file_name)
+        shutil.copyfile(path, staged_copy)
         session.file.put(
-            "improved_churn_model.pkl", "@ML_MODELS.RAW_DATA_STAGE", auto_compress=False
+            staged_copy, MODEL_STAGE_DIR, auto_compress=False, overwrite=True
         )
+    return file_name, version
+
+
+def deploy_improved_churn_model(batch_size=UDF_BATCH_SIZE):
+    """Register the scoring UDFs and refresh stored scores; True on success"""
+    print("🚀 Starting model deployment...")
+    try:
         model_package = joblib.load("improved_churn_model.pkl")
-        model = model_package["model"]
-        scaler = model_package["scaler"]
-        feature_columns = model_package["feature_columns"]
-        model_type = model_package["model_type"]
-        print(f"✅ Loaded {model_type} model with features: {feature_columns}")
     except FileNotFoundError:
         print("❌ Model file not found. Please run improved_model_training.py first.")
-        return
+        return False
+    feature_columns = model_package["feature_columns"]
+    model_type = model_package["model_type"]
+    print(f"✅ Loaded {model_type} model with features: {feature_columns}")
 
+    from batch_scoring import create_predictions_view, score_churn_predictions
+
+    session = Session.builder.configs(SNOWFLAKE_CONFIG).create()
     try:
+        model_file, version = stage_model_artifact(session)
+        print(f"📦 Staged {model_file} (version {version})")
+
+        # Scoring SQL uses the training-time constants as literals, so no
+        # query re-scans USER_FEATURES for quantiles
+        thresholds = feature_thresholds(session, model_package)
+        segment_encoding = model_package.get("segment_encoding", SEGMENT_ENCODING)
+        save_model_metadata(session, version, model_type, thresholds, segment_encoding)
+        print(f"📏 Feature thresholds: {thresholds}")
+
+        # The UDFs capture only the file name and version; each Python worker
+        # loads the staged model from its imports once and caches it
+        udf_imports = SCORING_MODULES + [f"{MODEL_STAGE_DIR}/{model_file}"]
+
         print("🔧 Creating Snowflake UDF...")
 
         def predict_churn_probability(
@@ -45,37 +172,33 @@ def deploy_improved_churn_model():
             payment_method_count,
             customer_segment_encoded,
         ):
-            try:
-                features = np.array(
-                    [
-                        [
-                            float(age or 0),
-                            float(total_transactions or 0),
-                            float(total_spent or 0),
-                            float(avg_transaction_amount or 0),
-                            float(days_since_last_transaction or 0),
-                            float(transactions_last_30_days or 0),
-                            float(spend_per_transaction or 0),
-                            float(high_value_customer or 0),
-                            float(frequent_buyer or 0),
-                            float(recency_score or 0),
-                            float(payment_method_count or 0),
-                            float(customer_segment_encoded or 0),
-                        ]
-                    ]
-                )
-                if model_type == "LogisticRegression" and scaler:
-                    features = scaler.transform(features)
-                return float(model.predict_proba(features)[:, 1][0])
-            except Exception:
-                return 0.5
+            model, scaler = load_model_and_scaler(model_file, version)
+            return score_row(
+                model,
+                scaler,
+                [
+                    age,
+                    total_transactions,
+                    total_spent,
+                    avg_transaction_amount,
+                    days_since_last_transaction,
+                    transactions_last_30_days,
+                    spend_per_transaction,
+                    high_value_customer,
+                    frequent_buyer,
+                    recency_score,
+                    payment_method_count,
+                    customer_segment_encoded,
+                ],
+            )
 
         session.udf.register(
             func=predict_churn_probability,
             name="predict_churn_probability",
             return_type=FloatType(),
             input_types=[FloatType()] * 12,
-            packages=["scikit-learn==1.3.0", "numpy==1.26.4", "pandas==2.0.3"],
+            packages=UDF_PACKAGES,
+            imports=udf_imports,
             replace=True,
             is_permanent=True,
             stage_location="@ML_MODELS.RAW_DATA_STAGE",
@@ -120,42 +243,68 @@ def deploy_improved_churn_model():
             name="predict_churn_binary",
             return_type=BooleanType(),
             input_types=[FloatType()] * 12,
-            packages=["scikit-learn==1.3.0", "numpy==1.26.4", "pandas==2.0.3"],
+            packages=UDF_PACKAGES,
+            imports=udf_imports,
             replace=True,
             is_permanent=True,
             stage_location="@ML_MODELS.RAW_DATA_STAGE",
         )
         print("✅ UDF 'predict_churn_binary' registered successfully!")
 
+        # Vectorized UDFs receive up to batch_size rows as one pandas DataFrame,
+        # so the model runs once per batch instead of once (or twice) per row
+        def predict_churn_batch(features_df):
+            model, scaler = load_model_and_scaler(model_file, version)
+            probabilities = score_batch(model, scaler, features_df)
+            return pd.Series(
+                [
+                    {"probability": float(p), "label": bool(p > 0.5)}
+                    for p in probabilities
+                ]
+            )
+
+        session.udf.register(
+            func=predict_churn_batch,
+            name="predict_churn_batch",
+            return_type=PandasSeriesType(VariantType()),
+            input_types=[PandasDataFrameType([FloatType()] * 12)],
+            max_batch_size=batch_size,
+            packages=UDF_PACKAGES,
+            imports=udf_imports,
+            replace=True,
+            is_permanent=True,
+            stage_location="@ML_MODELS.RAW_DATA_STAGE",
+        )
+        print("✅ Vectorized UDF 'predict_churn_batch' registered successfully!")
+
+        def predict_churn_probability_batch(features_df):
+            model, scaler = load_model_and_scaler(model_file, version)
+            return pd.Series(score_batch(model, scaler, features_df))
+
+        session.udf.register(
+            func=predict_churn_probability_batch,
+            name="predict_churn_probability_batch",
+            return_type=PandasSeriesType(FloatType()),
+            input_types=[PandasDataFrameType([FloatType()] * 12)],
+            max_batch_size=batch_size,
+            packages=UDF_PACKAGES,
+            imports=udf_imports,
+            replace=True,
+            is_permanent=True,
+            stage_location="@ML_MODELS.RAW_DATA_STAGE",
+        )
+        print(
+            "✅ Vectorized UDF 'predict_churn_probability_batch' registered successfully!"
+        )
+
         print("🧪 Testing UDFs...")
+        feature_select = ",".join(
+            f"\n            {expr} as {name}"
+            for name, expr in feature_exprs_sql(thresholds, segment_encoding)
+        )
         test_query = f"""
         SELECT 
-            user_id,
-            age,
-            total_transactions,
-            total_spent,
-            avg_transaction_amount,
-            days_since_last_transaction,
-            transactions_last_30_days,
-            CASE 
-                WHEN total_transactions > 0 THEN total_spent / total_transactions 
-                ELSE 0 
-            END as spend_per_transaction,
-            CASE 
-                WHEN total_spent > (SELECT PERCENTILE_CONT(0.8) WITHIN GROUP (ORDER BY total_spent) FROM FEATURES.USER_FEATURES) 
-                THEN 1 ELSE 0 
-            END as high_value_customer,
-            CASE 
-                WHEN total_transactions > (SELECT PERCENTILE_CONT(0.8) WITHIN GROUP (ORDER BY total_transactions) FROM FEATURES.USER_FEATURES) 
-                THEN 1 ELSE 0 
-            END as frequent_buyer,
-            recency_score,
-            payment_method_count,
-            CASE 
-                WHEN customer_segment = 'Premium' THEN 2
-                WHEN customer_segment = 'Standard' THEN 1
-                ELSE 0 
-            END as customer_segment_encoded,
+            user_id,{feature_select},
             is_churned as actual_churn
         FROM FEATURES.USER_FEATURES 
         LIMIT 10
@@ -169,80 +318,33 @@ def deploy_improved_churn_model():
             age,
             total_transactions,
             total_spent,
-            is_churned as actual_churn,
-            predict_churn_probability(
-                age, 
-                total_transactions, 
-                total_spent, 
-                avg_transaction_amount,
-                days_since_last_transaction,
-                transactions_last_30_days,
-                CASE WHEN total_transactions > 0 THEN total_spent / total_transactions ELSE 0 END,
-                CASE WHEN total_spent > (SELECT PERCENTILE_CONT(0.8) WITHIN GROUP (ORDER BY total_spent) FROM FEATURES.USER_FEATURES) THEN 1 ELSE 0 END,
-                CASE WHEN total_transactions > (SELECT PERCENTILE_CONT(0.8) WITHIN GROUP (ORDER BY total_transactions) FROM FEATURES.USER_FEATURES) THEN 1 ELSE 0 END,
-                recency_score,
-                payment_method_count,
-                CASE WHEN customer_segment = 'Premium' THEN 2 WHEN customer_segment = 'Standard' THEN 1 ELSE 0 END
-            ) as churn_probability,
-            predict_churn_binary(
-                age, 
-                total_transactions, 
-                total_spent, 
-                avg_transaction_amount,
-                days_since_last_transaction,
-                transactions_last_30_days,
-                CASE WHEN total_transactions > 0 THEN total_spent / total_transactions ELSE 0 END,
-                CASE WHEN total_spent > (SELECT PERCENTILE_CONT(0.8) WITHIN GROUP (ORDER BY total_spent) FROM FEATURES.USER_FEATURES) THEN 1 ELSE 0 END,
-                CASE WHEN total_transactions > (SELECT PERCENTILE_CONT(0.8) WITHIN GROUP (ORDER BY total_transactions) FROM FEATURES.USER_FEATURES) THEN 1 ELSE 0 END,
-                recency_score,
-                payment_method_count,
-                CASE WHEN customer_segment = 'Premium' THEN 2 WHEN customer_segment = 'Standard' THEN 1 ELSE 0 END
-            ) as churn_prediction
-        FROM FEATURES.USER_FEATURES 
-        LIMIT 10
+            actual_churn,
+            churn_score:probability::FLOAT as churn_probability,
+            churn_score:label::BOOLEAN as churn_prediction
+        FROM (
+            SELECT 
+                user_id,
+                age,
+                total_transactions,
+                total_spent,
+                is_churned as actual_churn,
+                predict_churn_batch({feature_args_sql(thresholds, segment_encoding)}
+                ) as churn_score
+            FROM FEATURES.USER_FEATURES 
+            LIMIT 10
+        )
         """
 
         result = session.sql(prediction_query)
         print("📊 Prediction Results:")
         result.show()
 
-        print("📋 Creating prediction view...")
-        view_query = f"""
-        CREATE OR REPLACE VIEW ML_MODELS.CUSTOMER_CHURN_PREDICTIONS AS
-        SELECT 
-            f.*,
-            predict_churn_probability(
-                f.age, 
-                f.total_transactions, 
-                f.total_spent, 
-                f.avg_transaction_amount,
-                f.days_since_last_transaction,
-                f.transactions_last_30_days,
-                CASE WHEN f.total_transactions > 0 THEN f.total_spent / f.total_transactions ELSE 0 END,
-                CASE WHEN f.total_spent > (SELECT PERCENTILE_CONT(0.8) WITHIN GROUP (ORDER BY total_spent) FROM FEATURES.USER_FEATURES) THEN 1 ELSE 0 END,
-                CASE WHEN f.total_transactions > (SELECT PERCENTILE_CONT(0.8) WITHIN GROUP (ORDER BY total_transactions) FROM FEATURES.USER_FEATURES) THEN 1 ELSE 0 END,
-                f.recency_score,
-                f.payment_method_count,
-                CASE WHEN f.customer_segment = 'Premium' THEN 2 WHEN f.customer_segment = 'Standard' THEN 1 ELSE 0 END
-            ) as churn_probability,
-            predict_churn_binary(
-                f.age, 
-                f.total_transactions, 
-                f.total_spent, 
-                f.avg_transaction_amount,
-                f.days_since_last_transaction,
-                f.transactions_last_30_days,
-                CASE WHEN f.total_transactions > 0 THEN f.total_spent / f.total_transactions ELSE 0 END,
-                CASE WHEN f.total_spent > (SELECT PERCENTILE_CONT(0.8) WITHIN GROUP (ORDER BY total_spent) FROM FEATURES.USER_FEATURES) THEN 1 ELSE 0 END,
-                CASE WHEN f.total_transactions > (SELECT PERCENTILE_CONT(0.8) WITHIN GROUP (ORDER BY total_transactions) FROM FEATURES.USER_FEATURES) THEN 1 ELSE 0 END,
-                f.recency_score,
-                f.payment_method_count,
-                CASE WHEN f.customer_segment = 'Premium' THEN 2 WHEN f.customer_segment = 'Standard' THEN 1 ELSE 0 END
-            ) as churn_prediction
-        FROM FEATURES.USER_FEATURES f
-        """
+        # Scores are materialized once per model version and feature change,
+        # so the view below is a plain join and reading it runs no UDFs
+        score_churn_predictions(session, version, thresholds, segment_encoding)
 
-        session.sql(view_query).collect()
+        print("📋 Creating prediction view...")
+        create_predictions_view(session)
         print("✅ View created successfully!")
 
         print("📈 Model Performance Summary:")
@@ -262,13 +364,17 @@ def deploy_improved_churn_model():
         print("📍 You can now use:")
         print("   - predict_churn_probability() function for probability scores")
         print("   - predict_churn_binary() function for binary predictions")
+        print("   - predict_churn_batch() vectorized function for probability + label")
+        print("   - ML_MODELS.CHURN_PREDICTIONS table of materialized scores")
         print("   - ML_MODELS.CUSTOMER_CHURN_PREDICTIONS view for all predictions")
+        return True
 
     except Exception as e:
         print(f"❌ Error during deployment: {str(e)}")
         import traceback
 
         traceback.print_exc()
+        return False
 
     finally:
         session.close()
@@ -0,0 +1,249 @@
+import hashlib
+import json
+import os
+import time
+
+import pandas as pd
+
+CACHE_DIR = os.environ.get("FEATURE_CACHE_DIR", os.path.join("data", "feature_cache"))
+MAX_CACHE_BYTES = 5 * 1024**3
+INDEX_NAME = "cache_index.json"
+
+
+def change_token(session, table):
+    """Identity of a table's current contents, from INFORMATION_SCHEMA
+
+    Row count, bytes and LAST_ALTERED change whenever the table is rewritten,
+    so a matching token means the cached copy is still current.
+    """
+    schema, name = table.upper().split(".")
+    rows = session.sql(f"""
+        SELECT row_count, bytes, last_altered
+        FROM INFORMATION_SCHEMA.TABLES
+        WHERE table_schema = '{schema}' AND table_name = '{name}'
+        """).collect()
+    if not rows:
+        raise ValueError(f"Table {table} not found")
+    identity = [
+        session.get_current_database(),
+        table.upper(),
+        rows[0]["ROW_COUNT"],
+        rows[0]["BYTES"],
+        str(rows[0]["LAST_ALTERED"]),
+    ]
+    return hashlib.blake2b(json.dumps(identity).encode(), digest_size=8).hexdigest()
+
+
+def _load_index(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, INDEX_NAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _save_index(cache_dir, index):
+    path = os.path.join(cache_dir, INDEX_NAME)
+    with open(path + ".tmp", "w") as f:
+        json.dump(index, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def evict(cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES, keep=()):
+    """Delete least recently used entries until the cache fits in max_bytes"""
+    index = _load_index(cache_dir)
+    # Entries whose file is gone no longer count
+    index = {
+        file_name: entry
+        for file_name, entry in index.items()
+        if os.path.exists(os.path.join(cache_dir, file_name))
+    }
+    total = sum(entry["size"] for entry in index.values())
+    for file_name, entry in sorted(
+        index.items(), key=lambda item: item[1]["last_used"]
+    ):
+        if total <= max_bytes:
+            break
+        if file_name in keep:
+            continue
+        os.remove(os.path.join(cache_dir, file_name))
+        total -= entry["size"]
+        del index[file_name]
+        print(f"🧹 Evicted {file_name} from the feature cache")
+    _save_index(cache_dir, index)
+
+
+def _arrow_type(datatype):
+    """Fixed Arrow type for a Snowpark column type, whatever a batch holds
+
+    Batches of the same column can come back as different pandas dtypes
+    (int8 vs int64 from NUMBER precision, float once nulls appear, object when
+    all null), so the file schema comes from the column type instead.
+    """
+    import pyarrow as pa
+
+    kind = type(datatype).__name__
+    if kind in ("LongType", "IntegerType", "ShortType", "ByteType"):
+        return pa.int64()
+    if kind == "DecimalType":
+        return pa.int64() if datatype.scale == 0 else pa.float64()
+    if kind in ("DoubleType", "FloatType"):
+        return pa.float64()
+    if kind == "BooleanType":
+        return pa.bool_()
+    if kind == "StringType":
+        return pa.dictionary(pa.int32(), pa.string())
+    if kind == "DateType":
+        return pa.date32()
+    if kind == "TimestampType":
+        return pa.timestamp("us")
+    return None
+
+
+def _batch_type(column_type):
+    """Widest Arrow type of a batch column's kind, for columns of unknown type"""
+    import pyarrow as pa
+
+    if pa.types.is_integer(column_type):
+        return pa.int64()
+    if pa.types.is_floating(column_type):
+        return pa.float64()
+    if pa.types.is_string(column_type):
+        return pa.dictionary(pa.int32(), pa.string())
+    return column_type
+
+
+def _download(dataframe, path):
+    """Stream a Snowpark DataFrame to Parquet in batches, strings dictionary-encoded
+
+    Every batch is cast to one schema fixed from the DataFrame's column types,
+    so batches that pandas typed differently still append to the same file.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    column_types = {
+        field.name.strip('"'): _arrow_type(field.datatype)
+        for field in dataframe.schema.fields
+    }
+    writer = None
+    rows = 0
+    try:
+        for df in dataframe.to_pandas_batches():
+            batch = pa.Table.from_pandas(df, preserve_index=False)
+            if writer is None:
+                schema = pa.schema(
+                    [
+                        (
+                            field.name,
+                            column_types.get(field.name) or _batch_type(field.type),
+                        )
+                        for field in batch.schema
+                    ]
+                )
+                writer = pq.ParquetWriter(path, schema, compression="zstd")
+            writer.write_table(
+                pa.table(
+                    [batch.column(field.name).cast(field.type) for field in schema],
+                    schema=schema,
+                )
+            )
+            rows += len(df)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def cached_table_path(
+    session, table, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES, query=None
+):
+    """Local Parquet copy of table's current version, downloading it on a miss
+
+    With query (a SELECT over table), the query's result is cached instead,
+    keyed by both the table's change token and the query text.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    token = change_token(session, table)
+    if query is not None:
+        token += "-" + hashlib.blake2b(query.encode(), digest_size=4).hexdigest()
+    file_name = f"{table.lower().replace('.', '__')}-{token}.parquet"
+    path = os.path.join(cache_dir, file_name)
+    index = _load_index(cache_dir)
+
+    if os.path.exists(path) and file_name in index:
+        print(f"⚡ Feature cache hit for {table} ({file_name})")
+    else:
+        print(f"📥 Caching {table} locally...")
+        start = time.perf_counter()
+        source = session.sql(query) if query is not None else session.table(table)
+        try:
+            rows = _download(source, path + ".tmp")
+        except BaseException:
+            # A partial file must never become a cache entry
+            if os.path.exists(path + ".tmp"):
+                os.remove(path + ".tmp")
+            raise
+        os.replace(path + ".tmp", path)
+        print(
+            f"✅ Cached {rows:,} rows in {time.perf_counter() - start:.1f}s "
+            f"({os.path.getsize(path) / 1e6:.1f} MB)"
+        )
+        index[file_name] = {"table": table, "token": token, "query": query}
+
+    _record_use(cache_dir, index, file_name, max_bytes)
+    return path
+
+
+def _record_use(cache_dir, index, file_name, max_bytes):
+    index[file_name]["size"] = os.path.getsize(os.path.join(cache_dir, file_name))
+    index[file_name]["last_used"] = time.time()
+    _save_index(cache_dir, index)
+    evict(cache_dir, max_bytes, keep=(file_name,))
+
+
+def cached_value(
+    session, table, name, compute, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES
+):
+    """A small JSON value derived from table, recomputed only when it changes
+
+    Keyed by the table's change token like the cached copies, so a cache hit
+    costs one metadata query instead of the aggregate behind compute.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    token = change_token(session, table)
+    file_name = f"{table.lower().replace('.', '__')}-{token}-{name}.json"
+    path = os.path.join(cache_dir, file_name)
+    index = _load_index(cache_dir)
+
+    if os.path.exists(path) and file_name in index:
+        print(f"⚡ Feature cache hit for {name} of {table}")
+        with open(path) as f:
+            value = json.load(f)
+    else:
+        value = compute()
+        with open(path + ".tmp", "w") as f:
+            json.dump(value, f)
+        os.replace(path + ".tmp", path)
+        index[file_name] = {"table": table, "token": token, "value": name}
+
+    _record_use(cache_dir, index, file_name, max_bytes)
+    return value
+
+
+def compact_frame(df):
+    """Smallest integer type per integer column; dictionary columns as strings"""
+    for column in df.columns:
+        if pd.api.types.is_integer_dtype(df[column]):
+            df[column] = pd.to_numeric(df[column], downcast="integer")
+        elif isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype(object)
+    return df
+
+
+def load_cached_table(
+    session, table, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES, query=None
+):
+    """A table (or query over it) as a DataFrame, cached while still current"""
+    df = pd.read_parquet(cached_table_path(session, table, cache_dir, max_bytes, query))
+    return compact_frame(df)
@@ -0,0 +1,158 @@
+import numpy as np
+
+FEATURES_TABLE = "FEATURES.USER_FEATURES"
+SEGMENT_ENCODING = {"Premium": 2, "Standard": 1, "Basic": 0}
+THRESHOLD_QUANTILE = 0.8
+
+
+class Column:
+    """A USER_FEATURES column passed through unchanged"""
+
+    def __init__(self, name):
+        self.name = name
+        self.sources = [name]
+
+    def sql(self, f, params):
+        return f"{f}{self.name}"
+
+    def evaluate(self, frame, params):
+        return np.asarray(frame[self.name], dtype=np.float64)
+
+
+class SafeDivide:
+    """numerator / denominator, dividing by 1 where the denominator is 0"""
+
+    def __init__(self, numerator, denominator):
+        self.numerator = numerator
+        self.denominator = denominator
+        self.sources = [numerator, denominator]
+
+    def sql(self, f, params):
+        d = f"{f}{self.denominator}"
+        return f"{f}{self.numerator} / IFF({d} = 0, 1, {d})"
+
+    def evaluate(self, frame, params):
+        denominator = np.asarray(frame[self.denominator], dtype=np.float64)
+        numerator = np.asarray(frame[self.numerator], dtype=np.float64)
+        return numerator / np.where(denominator == 0, 1, denominator)
+
+
+class AboveThreshold:
+    """1 where a column exceeds its fitted THRESHOLD_QUANTILE, else 0"""
+
+    def __init__(self, name):
+        self.name = name
+        self.sources = [name]
+
+    def sql(self, f, params):
+        threshold = params["thresholds"][self.name]
+        return f"CASE WHEN {f}{self.name} > {threshold!r} THEN 1 ELSE 0 END"
+
+    def evaluate(self, frame, params):
+        values = np.asarray(frame[self.name], dtype=np.float64)
+        # NaN compares False, like NULL falling through to ELSE 0
+        return (values > params["thresholds"][self.name]).astype(np.float64)
+
+
+class Encoded:
+    """Category codes from the segment encoding; unknown or NULL is 0"""
+
+    def __init__(self, name):
+        self.name = name
+        self.sources = [name]
+
+    def sql(self, f, params):
+        cases = " ".join(
+            f"WHEN {f}{self.name} = '{value}' THEN {code}"
+            for value, code in params["segment_encoding"].items()
+        )
+        return f"CASE {cases} ELSE 0 END"
+
+    def evaluate(self, frame, params):
+        values = np.asarray(frame[self.name], dtype=object)
+        encoding = params["segment_encoding"]
+        return np.select(
+            [values == value for value in encoding],
+            [float(code) for code in encoding.values()],
+            default=0.0,
+        )
+
+
+# Every model input, declared once, in the order the model receives them
+FEATURES = [
+    ("age", Column("age")),
+    ("total_transactions", Column("total_transactions")),
+    ("total_spent", Column("total_spent")),
+    ("avg_transaction_amount", Column("avg_transaction_amount")),
+    ("days_since_last_transaction", Column("days_since_last_transaction")),
+    ("transactions_last_30_days", Column("transactions_last_30_days")),
+    ("spend_per_transaction", SafeDivide("total_spent", "total_transactions")),
+    ("high_value_customer", AboveThreshold("total_spent")),
+    ("frequent_buyer", AboveThreshold("total_transactions")),
+    ("recency_score", Column("recency_score")),
+    ("payment_method_count", Column("payment_method_count")),
+    ("customer_segment_encoded", Encoded("customer_segment")),
+]
+
+FEATURE_COLUMNS = [name for name, _ in FEATURES]
+# Raw columns the features are computed from
+SOURCE_COLUMNS = list(
+    dict.fromkeys(source for _, feature in FEATURES for source in feature.sources)
+)
+# Columns whose fitted quantile some feature compares against
+THRESHOLD_COLUMNS = list(
+    dict.fromkeys(
+        feature.name for _, feature in FEATURES if isinstance(feature, AboveThreshold)
+    )
+)
+
+
+def feature_params(thresholds, segment_encoding=SEGMENT_ENCODING):
+    return {"thresholds": thresholds, "segment_encoding": segment_encoding}
+
+
+def feature_exprs_sql(thresholds, segment_encoding=SEGMENT_ENCODING, alias=""):
+    """(name, SQL expression) per feature, in FEATURE_COLUMNS order"""
+    f = f"{alias}." if alias else ""
+    params = feature_params(thresholds, segment_encoding)
+    return [(name, feature.sql(f, params)) for name, feature in FEATURES]
+
+
+def feature_projection_sql(
+    thresholds,
+    segment_encoding=SEGMENT_ENCODING,
+    table=FEATURES_TABLE,
+    extra_columns=("user_id", "is_churned"),
+):
+    """One SELECT that returns finished model inputs instead of raw columns"""
+    columns = list(extra_columns) + [
+        f"{expr} AS {name}"
+        for name, expr in feature_exprs_sql(thresholds, segment_encoding)
+    ]
+    return f"SELECT {', '.join(columns)} FROM {table}"
+
+
+def compute_features(frame, thresholds, segment_encoding=SEGMENT_ENCODING):
+    """Model input matrix from raw columns (a DataFrame or dict of arrays)
+
+    Missing values become 0, as in the UDFs, so local scoring, training and
+    the SQL projection all see the same numbers.
+    """
+    params = feature_params(thresholds, segment_encoding)
+    X = np.column_stack([feature.evaluate(frame, params) for _, feature in FEATURES])
+    return np.nan_to_num(X, nan=0.0)
+
+
+def fit_feature_thresholds_sql(
+    session, table=FEATURES_TABLE, quantile=THRESHOLD_QUANTILE
+):
+    """Quantile cut-offs fitted in the warehouse with one aggregate query
+
+    PERCENTILE_CONT interpolates linearly, like pandas' quantile.
+    """
+    percentiles = ", ".join(
+        f"PERCENTILE_CONT({quantile}) WITHIN GROUP (ORDER BY {column}) AS {column}"
+        for column in THRESHOLD_COLUMNS
+    )
+    row = session.sql(f"SELECT {percentiles} FROM {table}").collect()[0]
+    return {column: float(row[column.upper()]) for column in THRESHOLD_COLUMNS}
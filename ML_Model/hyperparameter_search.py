@@ -0,0 +1,218 @@
+import json
+import os
+import time
+
+import numpy as np
+from sklearn.model_selection import StratifiedKFold
+
+from model_selection import HOLDOUT, evaluate_candidates
+
+# Values to sample per family; n_estimators is the halving resource instead
+SEARCH_SPACE = {
+    "RandomForest": {
+        "max_depth": [6, 8, 10, 14, None],
+        "min_samples_split": [2, 5, 10, 20],
+        "min_samples_leaf": [1, 2, 5],
+        "max_features": ["sqrt", 0.5, 1.0],
+        "class_weight": ["balanced", None],
+    },
+    "LogisticRegression": {
+        "C": [0.01, 0.1, 1.0, 10.0],
+        "class_weight": ["balanced", None],
+    },
+}
+FIXED_PARAMS = {
+    "RandomForest": {"random_state": 42},
+    "LogisticRegression": {"random_state": 42, "max_iter": 1000},
+}
+# Resources double as the fixed-cost floor: the first rung never uses more
+# rows or trees than this, however large the table grows
+MIN_ROWS = 5000
+MIN_TREES = 25
+MAX_TREES = 400
+
+
+def sample_candidates(n_candidates, space=SEARCH_SPACE, seed=42):
+    """Distinct random (family, params) draws, split evenly across families"""
+    rng = np.random.default_rng(seed)
+    candidates, seen = [], set()
+    families = list(space)
+    attempts = 0
+    while len(candidates) < n_candidates and attempts < n_candidates * 20:
+        family = families[len(candidates) % len(families)]
+        params = {
+            name: values[rng.integers(len(values))]
+            for name, values in space[family].items()
+        }
+        key = (family, json.dumps(params, sort_keys=True))
+        attempts += 1
+        if key not in seen:
+            seen.add(key)
+            candidates.append((family, {**FIXED_PARAMS[family], **params}))
+    return candidates
+
+
+def with_trees(family, params, trees):
+    if family == "RandomForest":
+        return {**params, "n_estimators": int(trees)}
+    return params
+
+
+def rung_splits(y, train_rows, rows, folds, seed):
+    """CV folds over the first rows of a fixed shuffle of the training rows
+
+    Every rung uses a prefix of the same permutation, so larger rungs see a
+    superset of the smaller rungs' data.
+    """
+    subset = train_rows[:rows]
+    cv = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed)
+    return [
+        (fold, (subset[train], subset[test]))
+        for fold, (train, test) in enumerate(cv.split(np.zeros(rows), y[subset]))
+    ]
+
+
+def successive_halving(
+    X,
+    y,
+    splits,
+    time_budget,
+    n_candidates=24,
+    eta=3,
+    folds=3,
+    min_improvement=0.001,
+    final_share=0.3,
+    workers=None,
+    seed=42,
+):
+    """Budgeted search over SEARCH_SPACE; returns (final result, leaderboard)
+
+    Rung r scores the surviving candidates with MIN_ROWS * eta**r training rows
+    and MIN_TREES * eta**r trees, then keeps the best 1/eta by CV AUC. A rung
+    only starts if its cost, extrapolated from the previous rung, fits in what
+    is left of the search share of time_budget; the search also stops once
+    the best score improves by less than min_improvement between rungs.
+
+    The winner is refitted on as many training rows as the remaining budget
+    allows (all of them unless the table has outgrown the window) and scored
+    on the holdout split, so the whole call stays inside time_budget.
+    """
+    start = time.perf_counter()
+    search_budget = time_budget * (1 - final_share)
+    rng = np.random.default_rng(seed)
+    train_rows = rng.permutation(dict(splits)[HOLDOUT][0])
+    n_train = len(train_rows)
+
+    survivors = sample_candidates(n_candidates, seed=seed)
+    leaderboard = []
+    rows = min(MIN_ROWS, n_train)
+    trees = MIN_TREES
+    best_auc = -np.inf
+    rung = 0
+
+    while True:
+        print(
+            f"🪜 Rung {rung}: {len(survivors)} candidates, "
+            f"{rows:,} rows, {trees} trees"
+        )
+        rung_start = time.perf_counter()
+        results = evaluate_candidates(
+            [
+                (family, with_trees(family, params, trees))
+                for family, params in survivors
+            ],
+            X,
+            y,
+            rung_splits(y, train_rows, rows, folds, seed),
+            workers,
+        )
+        rung_seconds = time.perf_counter() - rung_start
+        for result in results:
+            leaderboard.append(
+                {
+                    "rung": rung,
+                    "family": result["family"],
+                    "params": result["params"],
+                    "rows": int(rows),
+                    "trees": int(trees) if result["family"] == "RandomForest" else None,
+                    "cv_auc_mean": result["cv_auc_mean"],
+                    "cv_auc_std": result["cv_auc_std"],
+                    "fit_seconds": float(max(result["fit_seconds"])),
+                    # Seconds per training row and tree, for extrapolation
+                    "cost": max(result["fit_seconds"])
+                    / (rows * (trees if result["family"] == "RandomForest" else 1)),
+                }
+            )
+
+        ranked = sorted(results, key=lambda result: -result["cv_auc_mean"])
+        keep = max(1, len(ranked) // eta)
+        survivors = [(r["family"], r["params"]) for r in ranked[:keep]]
+        improvement = ranked[0]["cv_auc_mean"] - best_auc
+        best_auc = max(best_auc, ranked[0]["cv_auc_mean"])
+
+        next_rows = min(rows * eta, n_train)
+        next_trees = min(trees * eta, MAX_TREES)
+        growth = (next_rows / rows) * (next_trees / trees) * keep / len(ranked)
+        estimate = rung_seconds * growth
+        elapsed = time.perf_counter() - start
+
+        if len(survivors) == 1 or (next_rows, next_trees) == (rows, trees):
+            break
+        if improvement < min_improvement:
+            print(f"⏹️ Best CV AUC improved by only {improvement:.4f}, stopping")
+            break
+        if elapsed + estimate > search_budget:
+            print(
+                f"⏹️ Next rung would take ~{estimate:.0f}s with "
+                f"{search_budget - elapsed:.0f}s of search budget left, stopping"
+            )
+            break
+        rows, trees = next_rows, next_trees
+        rung += 1
+
+    family, params = survivors[0]
+    best_entry = next(
+        entry
+        for entry in reversed(leaderboard)
+        if entry["family"] == family and entry["params"] == params
+    )
+
+    # Size the final fit to what is left of the whole budget
+    final_trees = MAX_TREES if family == "RandomForest" else 1
+    remaining = time_budget - (time.perf_counter() - start)
+    affordable = int(0.8 * remaining / (best_entry["cost"] * final_trees))
+    final_rows = max(min(n_train, affordable), min(rows, n_train))
+    if final_rows < n_train:
+        print(f"⚠️ Budget allows a final fit on {final_rows:,} of {n_train:,} rows")
+    holdout_splits = [(HOLDOUT, (train_rows[:final_rows], dict(splits)[HOLDOUT][1]))]
+
+    print(f"🏁 Refitting the winner: {family} {params}")
+    final = evaluate_candidates(
+        [(family, with_trees(family, params, final_trees))],
+        X,
+        y,
+        holdout_splits,
+        workers,
+    )[0]
+    final["search_seconds"] = time.perf_counter() - start
+    return final, leaderboard
+
+
+def save_leaderboard(leaderboard, model_path, final=None):
+    """Write the search leaderboard as JSON next to the model package"""
+    path = os.path.splitext(model_path)[0] + "_leaderboard.json"
+    ranked = sorted(
+        leaderboard, key=lambda entry: (-entry["rung"], -entry["cv_auc_mean"])
+    )
+    report = {"candidates": ranked}
+    if final is not None:
+        report["winner"] = {
+            "family": final["family"],
+            "params": final["params"],
+            "holdout_auc": final["holdout_auc"],
+            "search_seconds": final["search_seconds"],
+        }
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"📋 Leaderboard saved to {path}")
+    return path
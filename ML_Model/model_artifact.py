@@ -0,0 +1,57 @@
+import hashlib
+import os
+import sys
+import threading
+
+import joblib
+
+from churn_scoring import model_scaler
+
+MODEL_STAGE_DIR = "@ML_MODELS.RAW_DATA_STAGE/models"
+
+# One entry per Python worker process; UDFs in that process share it
+_CACHE = {}
+_LOCK = threading.Lock()
+
+
+def model_version(path):
+    """Short content hash of a model file, so every redeploy gets a new version"""
+    digest = hashlib.blake2b(digest_size=8)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def versioned_file_name(path, version):
+    stem, extension = os.path.splitext(os.path.basename(path))
+    return f"{stem}_{version}{extension}"
+
+
+def import_directory():
+    """Where Snowflake unpacks a UDF's imports; the working directory locally"""
+    return sys._xoptions.get("snowflake_import_directory", ".")
+
+
+def load_model_package(file_name, version):
+    """Load a staged model package once per process and reuse it
+
+    The cache is keyed by version: a redeploy registers the UDFs with a new
+    version, so the first call after it loads the new file and drops the old
+    package.
+    """
+    key = (file_name, version)
+    package = _CACHE.get(key)
+    if package is None:
+        with _LOCK:
+            package = _CACHE.get(key)
+            if package is None:
+                package = joblib.load(os.path.join(import_directory(), file_name))
+                _CACHE.clear()
+                _CACHE[key] = package
+    return package
+
+
+def load_model_and_scaler(file_name, version):
+    package = load_model_package(file_name, version)
+    return package["model"], model_scaler(package)
@@ -0,0 +1,166 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import StratifiedKFold
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+# name -> (estimator class, whether it is fitted on standardized features)
+MODEL_FAMILIES = {
+    "RandomForest": (RandomForestClassifier, False),
+    "LogisticRegression": (LogisticRegression, True),
+}
+
+DEFAULT_CANDIDATES = [
+    (
+        "RandomForest",
+        {
+            "n_estimators": 200,
+            "max_depth": 10,
+            "min_samples_split": 5,
+            "random_state": 42,
+            "class_weight": "balanced",
+        },
+    ),
+    (
+        "LogisticRegression",
+        {"random_state": 42, "class_weight": "balanced", "max_iter": 1000},
+    ),
+]
+
+HOLDOUT = "holdout"
+
+# Set once per worker process by _init_worker, so the data is not re-sent
+# with every task
+_DATA = {}
+
+
+def make_estimator(family, params):
+    """The estimator for a family; scaled families get their own scaler per fit"""
+    estimator_class, scaled = MODEL_FAMILIES[family]
+    model = estimator_class(**params)
+    if scaled:
+        return Pipeline([("scaler", StandardScaler()), ("model", model)])
+    return model
+
+
+def split_model(estimator):
+    """(model, scaler) in the shape the model package stores them"""
+    if isinstance(estimator, Pipeline):
+        return estimator.named_steps["model"], estimator.named_steps["scaler"]
+    return estimator, None
+
+
+def make_splits(X_train, y_train, X_test, y_test, folds=5, seed=42):
+    """Fold indices computed once and shared by every candidate
+
+    Folds index into X_train; the holdout split is the test set, appended to
+    the training rows, so one (X, y) pair serves every task.
+    """
+    X = np.vstack([np.asarray(X_train), np.asarray(X_test)])
+    y = np.concatenate([np.asarray(y_train), np.asarray(y_test)])
+    n_train = len(X_train)
+    cv = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed)
+    splits = list(enumerate(cv.split(np.zeros(n_train), np.asarray(y_train))))
+    splits.append((HOLDOUT, (np.arange(n_train), np.arange(n_train, len(X)))))
+    return X, y, splits
+
+
+def _init_worker(X, y):
+    _DATA["X"] = X
+    _DATA["y"] = y
+
+
+def _fit_split(index, family, params, split, train_idx, test_idx, keep_model):
+    X, y = _DATA["X"], _DATA["y"]
+    # Wall-clock time, comparable across worker processes
+    started = time.time()
+    estimator = make_estimator(family, params)
+    estimator.fit(X[train_idx], y[train_idx])
+    probabilities = estimator.predict_proba(X[test_idx])[:, 1]
+    return {
+        "index": index,
+        "split": split,
+        "auc": roc_auc_score(y[test_idx], probabilities),
+        "started": started,
+        "finished": time.time(),
+        "model": estimator if keep_model else None,
+        "probabilities": probabilities if keep_model else None,
+    }
+
+
+def evaluate_candidates(candidates, X, y, splits, workers=None):
+    """Fit every candidate on every split in parallel; one result per candidate
+
+    Each (candidate, split) pair is one task in a process pool, so with enough
+    cores the whole selection takes about as long as its slowest single fit.
+    The holdout fit's model and test-set probabilities are kept for the caller.
+    """
+    workers = workers or os.cpu_count()
+    results = [
+        {
+            "family": family,
+            "params": params,
+            "cv_auc": [],
+            "fit_seconds": [],
+            "started": [],
+            "finished": [],
+        }
+        for family, params in candidates
+    ]
+    with ProcessPoolExecutor(
+        workers, initializer=_init_worker, initargs=(X, y)
+    ) as pool:
+        futures = [
+            pool.submit(
+                _fit_split,
+                index,
+                family,
+                params,
+                split,
+                train_idx,
+                test_idx,
+                split == HOLDOUT,
+            )
+            for index, (family, params) in enumerate(candidates)
+            for split, (train_idx, test_idx) in splits
+        ]
+        for future in as_completed(futures):
+            fit = future.result()
+            result = results[fit["index"]]
+            result["fit_seconds"].append(fit["finished"] - fit["started"])
+            result["started"].append(fit["started"])
+            result["finished"].append(fit["finished"])
+            if fit["split"] == HOLDOUT:
+                result["holdout_auc"] = fit["auc"]
+                result["model"] = fit["model"]
+                result["probabilities"] = fit["probabilities"]
+            else:
+                result["cv_auc"].append(fit["auc"])
+
+    for result in results:
+        # From this candidate's first fit starting to its last one finishing
+        result["wall_seconds"] = max(result.pop("finished")) - min(
+            result.pop("started")
+        )
+        scores = []
+        if "holdout_auc" in result:
+            scores.append(f"holdout AUC {result['holdout_auc']:.3f}")
+        if result["cv_auc"]:
+            result["cv_auc_mean"] = float(np.mean(result["cv_auc"]))
+            result["cv_auc_std"] = float(np.std(result["cv_auc"]))
+            scores.append(
+                f"CV AUC {result['cv_auc_mean']:.3f} ± {result['cv_auc_std']:.3f}"
+            )
+        print(
+            f"🔹 {result['family']}: {', '.join(scores)}, "
+            f"{len(result['fit_seconds'])} fits in {result['wall_seconds']:.1f}s wall "
+            f"(slowest {max(result['fit_seconds']):.1f}s, "
+            f"total {sum(result['fit_seconds']):.1f}s)"
+        )
+    return results
@@ -1,32 +1,110 @@
+import argparse
 import sys
 import os
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import time
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split, cross_val_score
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.linear_model import LogisticRegression
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import (
-    classification_report,
-    accuracy_score,
-    roc_auc_score,
-    confusion_matrix,
-)
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import classification_report, accuracy_score
 import joblib
 from snowflake.snowpark import Session
 from snowflake_config import SNOWFLAKE_CONFIG
+from array_artifact import artifact_dir_for, save_artifact
+from model_selection import (
+    DEFAULT_CANDIDATES,
+    evaluate_candidates,
+    make_splits,
+    split_model,
+)
+from feature_registry import (
+    FEATURE_COLUMNS,
+    FEATURES_TABLE,
+    SEGMENT_ENCODING,
+    feature_projection_sql,
+    fit_feature_thresholds_sql,
+)
+from hyperparameter_search import save_leaderboard, successive_halving
+from streaming_training import BATCH_SIZE, train_streaming
+from feature_cache import cached_table_path, cached_value, load_cached_table
+
+MODEL_PATH = "improved_churn_model.pkl"
+SEARCH_TIME_BUDGET = 30 * 60
+
+
+def save_model_package(model_package):
+    joblib.dump(model_package, MODEL_PATH)
+    # Same model as mmap-able arrays, independent of the sklearn version
+    save_artifact(model_package, artifact_dir_for(MODEL_PATH))
+
+
+def train_streaming_churn_model(
+    features_path=None, batch_size=BATCH_SIZE, epochs=3, use_cache=True
+):
+    """Out-of-core training for feature tables too large to load at once
+
+    Reads USER_FEATURES (or a local Parquet copy) in batches; memory use
+    depends on batch_size, not on the number of users. With use_cache the
+    table is streamed into the local feature cache once and every pass reads
+    the cached file.
+    """
+    print("🚀 Starting streaming model training...")
+    session = (
+        None if features_path else Session.builder.configs(SNOWFLAKE_CONFIG).create()
+    )
+
+    try:
+        source = features_path or session
+        if session is not None and use_cache:
+            source = cached_table_path(session, FEATURES_TABLE)
+        model_package = train_streaming(source, batch_size, epochs)
+        print("💾 Saving model...")
+        save_model_package(model_package)
+        return model_package, model_package["feature_columns"]
+
+    except Exception as e:
+        print(f"❌ Error during streaming training: {str(e)}")
+        return None, None
+
+    finally:
+        if session is not None:
+            session.close()
+
 
+def train_improved_churn_model(
+    search=False, time_budget=SEARCH_TIME_BUDGET, use_cache=True
+):
+    """Train and save the churn model
 
-def train_improved_churn_model():
+    By default the DEFAULT_CANDIDATES are compared; with search, a successive
+    halving search over SEARCH_SPACE picks the model within time_budget seconds.
+    With use_cache, an unchanged USER_FEATURES is read from the local cache.
+    """
     print("🚀 Starting improved model training...")
 
     session = Session.builder.configs(SNOWFLAKE_CONFIG).create()
 
     try:
-        print("📥 Loading improved USER_FEATURES table...")
-        features_df = session.table("FEATURES.USER_FEATURES").to_pandas()
+        # Fitted once here and saved with the model, so scoring reuses them
+        if use_cache:
+            feature_thresholds = cached_value(
+                session,
+                FEATURES_TABLE,
+                "feature_thresholds",
+                lambda: fit_feature_thresholds_sql(session),
+            )
+        else:
+            feature_thresholds = fit_feature_thresholds_sql(session)
+        print(f"📏 Feature thresholds: {feature_thresholds}")
+
+        # Snowflake computes the model inputs; only finished columns come back
+        print("📥 Loading model inputs from USER_FEATURES...")
+        query = feature_projection_sql(feature_thresholds, SEGMENT_ENCODING)
+        if use_cache:
+            features_df = load_cached_table(session, FEATURES_TABLE, query=query)
+        else:
+            features_df = session.sql(query).to_pandas()
         features_df.columns = [col.lower() for col in features_df.columns]
 
         print(f"✅ Loaded {len(features_df)} user records")
@@ -39,35 +117,7 @@ def train_improved_churn_model():
             f"Churn Rate: {(churn_counts.get(True, 0) / len(features_df)) * 100:.2f}%"
         )
 
-        print("🛠️ Engineering additional features...")
-        features_df["spend_per_transaction"] = features_df["total_spent"] / features_df[
-            "total_transactions"
-        ].replace(0, 1)
-        features_df["high_value_customer"] = (
-            features_df["total_spent"] > features_df["total_spent"].quantile(0.8)
-        ).astype(int)
-        features_df["frequent_buyer"] = (
-            features_df["total_transactions"]
-            > features_df["total_transactions"].quantile(0.8)
-        ).astype(int)
-        features_df["customer_segment_encoded"] = features_df["customer_segment"].map(
-            {"Premium": 2, "Standard": 1, "Basic": 0}
-        )
-
-        feature_columns = [
-            "age",
-            "total_transactions",
-            "total_spent",
-            "avg_transaction_amount",
-            "days_since_last_transaction",
-            "transactions_last_30_days",
-            "spend_per_transaction",
-            "high_value_customer",
-            "frequent_buyer",
-            "recency_score",
-            "payment_method_count",
-            "customer_segment_encoded",
-        ]
+        feature_columns = list(FEATURE_COLUMNS)
 
         print("🔍 Preparing feature matrix...")
         X = features_df[feature_columns].fillna(0)
@@ -84,57 +134,30 @@ def train_improved_churn_model():
             X, y, test_size=0.2, random_state=42, stratify=y
         )
 
-        print("⚖️ Scaling features...")
-        scaler = StandardScaler()
-        X_train_scaled = scaler.fit_transform(X_train)
-        X_test_scaled = scaler.transform(X_test)
-
-        models = {
-            "RandomForest": RandomForestClassifier(
-                n_estimators=200,
-                max_depth=10,
-                min_samples_split=5,
-                random_state=42,
-                class_weight="balanced",
-            ),
-            "LogisticRegression": LogisticRegression(
-                random_state=42, class_weight="balanced", max_iter=1000
-            ),
-        }
-
-        best_model = None
-        best_score = 0
-        best_model_name = ""
-
-        print("🤖 Training multiple models...")
-        for name, model in models.items():
-            print(f"\n🔹 Training {name}...")
-
-            if name == "LogisticRegression":
-                model.fit(X_train_scaled, y_train)
-                y_pred = model.predict(X_test_scaled)
-                y_pred_proba = model.predict_proba(X_test_scaled)[:, 1]
-            else:
-                model.fit(X_train, y_train)
-                y_pred = model.predict(X_test)
-                y_pred_proba = model.predict_proba(X_test)[:, 1]
-
-            accuracy = accuracy_score(y_test, y_pred)
-            auc_score = roc_auc_score(y_test, y_pred_proba)
-            cv_scores = cross_val_score(model, X, y, cv=5, scoring="roc_auc")
-
-            print(f"Accuracy: {accuracy:.3f}")
-            print(f"AUC Score: {auc_score:.3f}")
-            print(
-                f"Cross-Validation AUC: {cv_scores.mean():.3f} ± {cv_scores.std():.3f}"
-            )
+        X_all, y_all, splits = make_splits(X_train, y_train, X_test, y_test)
+        start = time.perf_counter()
+        if search:
+            print(f"🔎 Searching hyperparameters within {time_budget:.0f}s...")
+            final, leaderboard = successive_halving(X_all, y_all, splits, time_budget)
+            save_leaderboard(leaderboard, MODEL_PATH, final)
+            results = [final]
+        else:
+            print("🤖 Training candidate models in parallel...")
+            results = evaluate_candidates(DEFAULT_CANDIDATES, X_all, y_all, splits)
+        print(f"⏱️ Model selection took {time.perf_counter() - start:.1f}s")
+
+        for result in results:
+            print(f"\n🔹 {result['family']} on the test set:")
+            y_pred = (result["probabilities"] > 0.5).astype(int)
+            print(f"Accuracy: {accuracy_score(y_test, y_pred):.3f}")
+            print(f"AUC Score: {result['holdout_auc']:.3f}")
             print("Classification Report:")
             print(classification_report(y_test, y_pred))
 
-            if auc_score > best_score:
-                best_score = auc_score
-                best_model = model
-                best_model_name = name
+        best = max(results, key=lambda result: result["holdout_auc"])
+        best_model, scaler = split_model(best["model"])
+        best_model_name = best["family"]
+        best_score = best["holdout_auc"]
 
         print(f"\n🏆 Best Model: {best_model_name} (AUC: {best_score:.3f})")
 
@@ -151,12 +174,14 @@ def train_improved_churn_model():
         print("💾 Saving model...")
         model_package = {
             "model": best_model,
-            "scaler": scaler if best_model_name == "LogisticRegression" else None,
+            "scaler": scaler,
             "feature_columns": feature_columns,
             "model_type": best_model_name,
+            "feature_thresholds": feature_thresholds,
+            "segment_encoding": SEGMENT_ENCODING,
         }
 
-        joblib.dump(model_package, "improved_churn_model.pkl")
+        save_model_package(model_package)
 
         print("✅ Model training completed successfully!")
         return model_package, feature_columns
@@ -170,7 +195,42 @@ def train_improved_churn_model():
 
 
 if __name__ == "__main__":
-    model_package, features = train_improved_churn_model()
+    parser = argparse.ArgumentParser(description="Train the churn model")
+    parser.add_argument(
+        "--search",
+        action="store_true",
+        help="search hyperparameters with successive halving",
+    )
+    parser.add_argument(
+        "--time-budget",
+        type=float,
+        default=SEARCH_TIME_BUDGET,
+        help="seconds the search and final fit may take",
+    )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="train out of core with SGD on batched feature reads",
+    )
+    parser.add_argument(
+        "--features", help="local Parquet copy of USER_FEATURES for --streaming"
+    )
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="always read USER_FEATURES from Snowflake",
+    )
+    args = parser.parse_args()
+
+    if args.streaming:
+        model_package, features = train_streaming_churn_model(
+            args.features, args.batch_size, use_cache=not args.no_cache
+        )
+    else:
+        model_package, features = train_improved_churn_model(
+            args.search, args.time_budget, use_cache=not args.no_cache
+        )
     if model_package:
         print("🎉 Training completed successfully!")
     else:
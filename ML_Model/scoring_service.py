@@ -0,0 +1,361 @@
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import urllib.request
+import warnings
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import joblib
+import numpy as np
+
+from churn_scoring import model_scaler, score_batch
+from array_artifact import load_artifact
+from compiled_model import (
+    COMPILED_MAX_BATCH,
+    compile_model,
+    hybrid_scorer,
+    predict_compiled,
+    with_level_layout,
+)
+from model_artifact import model_version
+from udf_benchmark import load_feature_matrix
+
+MAX_BATCH_SIZE = 256
+MAX_WAIT_MS = 2.0
+
+
+def rows_from_payload(payload, feature_columns):
+    """Feature rows from {"features": {...}} or {"instances": [{...}, ...]}
+
+    Each instance is a mapping of feature name to value or a list already in
+    feature_columns order. Missing values score as 0 like the UDFs.
+    """
+    if "features" in payload:
+        instances = [payload["features"]]
+    elif "instances" in payload:
+        instances = payload["instances"]
+    else:
+        raise ValueError('Expected a "features" or "instances" field')
+    if not instances:
+        raise ValueError("No instances to score")
+
+    rows = []
+    for instance in instances:
+        if isinstance(instance, dict):
+            unknown = set(instance) - set(feature_columns)
+            if unknown:
+                raise ValueError(f"Unknown feature columns {sorted(unknown)}")
+            instance = [instance.get(column) for column in feature_columns]
+        elif len(instance) != len(feature_columns):
+            raise ValueError(
+                f"Expected {len(feature_columns)} values, got {len(instance)}"
+            )
+        rows.append([np.nan if value is None else value for value in instance])
+    return np.array(rows, dtype=np.float64).reshape(-1, len(feature_columns))
+
+
+class MicroBatcher:
+    """Score concurrent requests together in one predict_proba call
+
+    Requests queue up; a single worker takes the first waiting request, then
+    keeps collecting until max_batch_size rows are gathered or max_wait_ms has
+    passed since that request arrived, and scores them all at once.
+    """
+
+    def __init__(
+        self,
+        score,
+        feature_columns,
+        max_batch_size=MAX_BATCH_SIZE,
+        max_wait_ms=MAX_WAIT_MS,
+    ):
+        self._score = score
+        self.feature_columns = feature_columns
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        # Running totals, so a long-lived service does not grow a list
+        self.batches_scored = 0
+        self.rows_scored = 0
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, rows):
+        """Queue a 2-D array of rows; the Future resolves to their probabilities"""
+        future = Future()
+        self._queue.put((rows, future))
+        return future
+
+    def score(self, rows):
+        return self.submit(rows).result()
+
+    def mean_batch_size(self):
+        return self.rows_scored / max(self.batches_scored, 1)
+
+    def close(self):
+        self._queue.put(None)
+        self._worker.join()
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        pending = [first]
+        rows = len(first[0])
+        deadline = time.perf_counter() + self.max_wait
+        while rows < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            pending.append(item)
+            rows += len(item[0])
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            if pending is None:
+                return
+            try:
+                probabilities = self._score(np.vstack([rows for rows, _ in pending]))
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            self.batches_scored += 1
+            self.rows_scored += len(probabilities)
+            start = 0
+            for rows, future in pending:
+                future.set_result(probabilities[start : start + len(rows)])
+                start += len(rows)
+
+
+def load_scorer(
+    path="improved_churn_model.pkl",
+    max_batch_size=MAX_BATCH_SIZE,
+    max_wait_ms=MAX_WAIT_MS,
+    compiled=False,
+):
+    """In-process scoring API: a MicroBatcher over the model, loaded once
+
+    path is a joblib package or an array_artifact directory. Artifacts are
+    memory-mapped and always scored with the compiled evaluator; compiled
+    packages use it for batches up to COMPILED_MAX_BATCH and sklearn above.
+    """
+    if os.path.isdir(path):
+        arrays = load_artifact(path)
+        if max_batch_size > COMPILED_MAX_BATCH:
+            print(
+                f"⚠️ Artifacts have no sklearn model to fall back on; batches over "
+                f"{COMPILED_MAX_BATCH} rows may score slower than sklearn would"
+            )
+        score = partial(predict_compiled, with_level_layout(arrays))
+        feature_columns = arrays["feature_columns"]
+        version = arrays["version"]
+    else:
+        model_package = joblib.load(path)
+        if compiled:
+            # Micro-batches are small, where the flat arrays beat sklearn
+            score = hybrid_scorer(model_package, compile_model(model_package))
+        else:
+            score = partial(
+                score_batch, model_package["model"], model_scaler(model_package)
+            )
+        feature_columns = model_package["feature_columns"]
+        version = model_version(path)
+
+    scorer = MicroBatcher(score, feature_columns, max_batch_size, max_wait_ms)
+    scorer.version = version
+    return scorer
+
+
+def make_handler(scorer):
+    class ScoringHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/health":
+                self._reply(404, {"error": "not found"})
+                return
+            self._reply(200, {"status": "ok", "model_version": scorer.version})
+
+        def do_POST(self):
+            if self.path != "/score":
+                self._reply(404, {"error": "not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length))
+                rows = rows_from_payload(payload, scorer.feature_columns)
+            except (TypeError, ValueError) as e:
+                # Malformed JSON, a non-object body or non-numeric features
+                self._reply(400, {"error": str(e)})
+                return
+            try:
+                probabilities = scorer.score(rows)
+            except Exception as e:
+                self._reply(500, {"error": f"scoring failed: {e}"})
+                return
+            self._reply(
+                200,
+                {
+                    "model_version": scorer.version,
+                    "probabilities": [float(p) for p in probabilities],
+                    "labels": [bool(p > 0.5) for p in probabilities],
+                },
+            )
+
+        def _reply(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ScoringHandler
+
+
+class ScoringServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default listen backlog of 5 resets connections under concurrent load
+    request_queue_size = 1024
+
+
+def serve(scorer, host="127.0.0.1", port=8080):
+    """Start the HTTP service in a background thread; returns the server"""
+    server = ScoringServer((host, port), make_handler(scorer))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def post_json(url, payload):
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(payload).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def generate_load(send, X, requests=2000, concurrency=32, rows_per_request=1):
+    """Fire requests from concurrency threads; report latency and throughput
+
+    send takes a 2-D array of rows and returns once they are scored, so the
+    same generator drives the HTTP service and the in-process API.
+    """
+
+    def timed(i):
+        start_row = (i * rows_per_request) % max(len(X) - rows_per_request, 1)
+        rows = X[start_row : start_row + rows_per_request]
+        start = time.perf_counter()
+        send(rows)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        latencies = np.array(list(pool.map(timed, range(requests)))) * 1000
+    elapsed = time.perf_counter() - start
+
+    report = {
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "requests_per_sec": requests / elapsed,
+        "rows_per_sec": requests * rows_per_request / elapsed,
+    }
+    print(
+        f"   p50 {report['p50_ms']:.2f} ms  p99 {report['p99_ms']:.2f} ms  "
+        f"{report['requests_per_sec']:,.0f} req/s  {report['rows_per_sec']:,.0f} rows/s"
+    )
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve churn scores over HTTP with micro-batching"
+    )
+    parser.add_argument(
+        "--model",
+        default="improved_churn_model.pkl",
+        help="joblib package or array_artifact directory",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-batch-size", type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+    parser.add_argument(
+        "--compiled",
+        action="store_true",
+        help="score with the flat-array model from compiled_model.py",
+    )
+    parser.add_argument(
+        "--load-test",
+        action="store_true",
+        help="run the built-in load generator against the service and exit",
+    )
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--rows-per-request", type=int, default=1)
+    args = parser.parse_args()
+
+    # Models fitted on DataFrames warn on every plain-array batch
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+    scorer = load_scorer(
+        args.model, args.max_batch_size, args.max_wait_ms, args.compiled
+    )
+    server = serve(scorer, args.host, args.port)
+    url = f"http://{args.host}:{server.server_address[1]}"
+    print(f"✅ Serving model {scorer.version} at {url}/score")
+
+    try:
+        if not args.load_test:
+            while True:
+                time.sleep(3600)
+
+        X = load_feature_matrix(None, scorer.feature_columns, 10_000)
+        columns = scorer.feature_columns
+        print(
+            f"📊 {args.requests} requests x {args.rows_per_request} rows, "
+            f"{args.concurrency} concurrent:"
+        )
+        print(" HTTP service")
+        generate_load(
+            lambda rows: post_json(
+                f"{url}/score",
+                {"instances": [dict(zip(columns, map(float, row))) for row in rows]},
+            ),
+            X,
+            args.requests,
+            args.concurrency,
+            args.rows_per_request,
+        )
+        print(" In-process API")
+        generate_load(
+            scorer.score, X, args.requests, args.concurrency, args.rows_per_request
+        )
+        print(f"   mean micro-batch: {scorer.mean_batch_size():.1f} rows")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        scorer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+import argparse
+import math
+import os
+import sqlite3
+import sys
+import warnings
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import joblib
+import numpy as np
+
+from churn_scoring import model_scaler, score_batch
+from compiled_model import compile_model
+from feature_registry import FEATURES_TABLE, SEGMENT_ENCODING, feature_exprs_sql
+from udf_benchmark import load_feature_matrix
+
+SQL_SCORES_VIEW = "ML_MODELS.CHURN_SCORES_SQL"
+# Snowflake rejects statements longer than this
+MAX_SQL_BYTES = 1_000_000
+
+
+def _literal(value):
+    value = float(value)
+    # nan and inf would be read as identifiers, not numbers
+    if not math.isfinite(value):
+        raise ValueError(f"Cannot write non-finite value {value} as a SQL literal")
+    # repr is the shortest text that parses back to the same double
+    return repr(value)
+
+
+def split_condition(column, threshold):
+    """SQL test matching sklearn's float32(x) <= threshold for a double x
+
+    float32(x) rounds to nearest, ties to even, so it stays at or below the
+    float32 threshold exactly while x is below the midpoint to the next
+    float32 up, and also at the midpoint when the threshold's mantissa is
+    even. The midpoint is exact in double precision, so SQL on FLOAT columns
+    takes every branch sklearn takes.
+    """
+    threshold = np.float32(threshold)
+    above = np.nextafter(threshold, np.float32(np.inf))
+    midpoint = (float(threshold) + float(above)) / 2
+    even = int(threshold.view(np.uint32)) % 2 == 0
+    return f"{column} {'<=' if even else '<'} {_literal(midpoint)}"
+
+
+def linear_sql(compiled, inputs):
+    """Logistic link over the scaler-folded weights"""
+    terms = " + ".join(
+        f"{_literal(weight)} * {column}"
+        for weight, column in zip(compiled["weights"], inputs)
+    )
+    return f"1 / (1 + EXP(-({_literal(compiled['intercept'][0])} + {terms})))"
+
+
+def tree_sql(compiled, node, inputs, max_depth=None, depth=0):
+    """One tree as nested CASE expressions, starting at node
+
+    Past max_depth a node returns its own training mean instead of splitting.
+    """
+    left, right = compiled["children"][node]
+    if left == node or (max_depth is not None and depth >= max_depth):
+        return _literal(compiled["leaf_value"][node])
+    condition = split_condition(
+        inputs[compiled["feature"][node]], compiled["threshold"][node]
+    )
+    return (
+        f"CASE WHEN {condition} "
+        f"THEN {tree_sql(compiled, left, inputs, max_depth, depth + 1)} "
+        f"ELSE {tree_sql(compiled, right, inputs, max_depth, depth + 1)} END"
+    )
+
+
+def forest_sql(compiled, inputs, max_depth=None, max_trees=None):
+    """Average of the first max_trees trees, each cut at max_depth"""
+    roots = compiled["roots"][:max_trees]
+    trees = "\n    + ".join(
+        tree_sql(compiled, root, inputs, max_depth) for root in roots
+    )
+    return f"(\n    {trees}\n) / {len(roots)}"
+
+
+def model_sql(model_package, inputs=None, max_depth=None, max_trees=None):
+    """Churn probability of a model package as one SQL expression
+
+    inputs are the SQL expressions for the model's features, in order; by
+    default the feature column names. The caps only apply to forests.
+    """
+    compiled = compile_model(model_package)
+    inputs = inputs or compiled["feature_columns"]
+    if compiled["kind"] == "forest":
+        return forest_sql(compiled, inputs, max_depth, max_trees)
+    return linear_sql(compiled, inputs)
+
+
+def model_inputs_sql(thresholds, segment_encoding=SEGMENT_ENCODING, alias=""):
+    """Feature expressions as the model sees them, NULLs scored as 0 like the UDFs"""
+    return [
+        f"COALESCE({expr}, 0) AS {name}"
+        for name, expr in feature_exprs_sql(thresholds, segment_encoding, alias)
+    ]
+
+
+def package_thresholds(model_package):
+    """The feature thresholds saved with a model package
+
+    Packages trained before thresholds were saved cannot be exported offline;
+    deploy_model_udf.feature_thresholds can compute them with a session.
+    """
+    thresholds = model_package.get("feature_thresholds")
+    if thresholds is None:
+        raise ValueError(
+            "Model package has no feature thresholds; retrain the model "
+            "(or export with --deploy to compute them in Snowflake)"
+        )
+    return thresholds
+
+
+def scoring_view_sql(
+    model_package,
+    view=SQL_SCORES_VIEW,
+    table=FEATURES_TABLE,
+    max_depth=None,
+    max_trees=None,
+    thresholds=None,
+):
+    """A view that scores every user in plain SQL, with no UDF involved"""
+    inputs = ",\n            ".join(
+        model_inputs_sql(
+            thresholds or package_thresholds(model_package),
+            model_package.get("segment_encoding", SEGMENT_ENCODING),
+        )
+    )
+    score = model_sql(model_package, max_depth=max_depth, max_trees=max_trees)
+    return f"""CREATE OR REPLACE VIEW {view} AS
+SELECT
+    user_id,
+    churn_probability,
+    churn_probability > 0.5 AS churn_prediction
+FROM (
+    SELECT
+        user_id,
+        {score} AS churn_probability
+    FROM (
+        SELECT
+            user_id,
+            {inputs}
+        FROM {table}
+    )
+)
+"""
+
+
+def sql_probabilities(score, feature_columns, X):
+    """Evaluate a scoring expression over feature rows with in-memory SQLite"""
+    connection = sqlite3.connect(":memory:")
+    try:
+        try:
+            connection.execute("SELECT EXP(0)")
+        except sqlite3.OperationalError:
+            # SQLite builds without the math functions
+            connection.create_function("EXP", 1, math.exp, deterministic=True)
+        columns = ", ".join(f"{column} REAL" for column in feature_columns)
+        connection.execute(f"CREATE TABLE features ({columns})")
+        placeholders = ", ".join("?" for _ in feature_columns)
+        connection.executemany(
+            f"INSERT INTO features VALUES ({placeholders})", X.tolist()
+        )
+        rows = connection.execute(f"SELECT {score} FROM features").fetchall()
+        return np.array([row[0] for row in rows], dtype=np.float64)
+    finally:
+        connection.close()
+
+
+def check_sql_parity(model_package, score, X):
+    """Largest absolute difference between the SQL scores and predict_proba"""
+    X = np.nan_to_num(np.asarray(X, dtype=np.float64), nan=0.0)
+    expected = score_batch(model_package["model"], model_scaler(model_package), X)
+    actual = sql_probabilities(score, model_package["feature_columns"], X)
+    return float(np.max(np.abs(actual - expected)))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export a churn model as a SQL scoring view and check parity"
+    )
+    parser.add_argument("--model", default="improved_churn_model.pkl")
+    parser.add_argument("--features", help="CSV/Parquet file with feature columns")
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--max-depth", type=int, help="cut forest trees at this depth")
+    parser.add_argument("--max-trees", type=int, help="keep only this many trees")
+    parser.add_argument("--out", help="where to write the view DDL")
+    parser.add_argument(
+        "--deploy", action="store_true", help=f"create {SQL_SCORES_VIEW} in Snowflake"
+    )
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+    model_package = joblib.load(args.model)
+    feature_columns = model_package["feature_columns"]
+
+    session = None
+    if args.deploy:
+        from snowflake.snowpark import Session
+        from snowflake_config import SNOWFLAKE_CONFIG
+
+        session = Session.builder.configs(SNOWFLAKE_CONFIG).create()
+
+    try:
+        if "feature_thresholds" in model_package:
+            thresholds = package_thresholds(model_package)
+        elif session is not None:
+            from deploy_model_udf import feature_thresholds
+
+            thresholds = feature_thresholds(session, model_package)
+        else:
+            print(
+                f"❌ {args.model} has no feature thresholds; retrain the model "
+                "or pass --deploy to compute them in Snowflake"
+            )
+            return
+
+        score = model_sql(
+            model_package, max_depth=args.max_depth, max_trees=args.max_trees
+        )
+        X = load_feature_matrix(args.features, feature_columns, args.rows)
+        difference = check_sql_parity(model_package, score, X)
+        capped = args.max_depth is not None or args.max_trees is not None
+        print(
+            f"🔍 Max |SQL - predict_proba| over {len(X):,} rows: {difference:.2e}"
+            + (" (capped model)" if capped else "")
+        )
+
+        ddl = scoring_view_sql(
+            model_package,
+            max_depth=args.max_depth,
+            max_trees=args.max_trees,
+            thresholds=thresholds,
+        )
+        print(f"📝 View DDL is {len(ddl) / 1e3:.0f} KB")
+        if len(ddl) > MAX_SQL_BYTES:
+            print(
+                f"⚠️ Over Snowflake's {MAX_SQL_BYTES / 1e6:.0f} MB statement limit; "
+                "use --max-depth / --max-trees"
+            )
+        out = args.out or os.path.splitext(args.model)[0] + "_scores.sql"
+        with open(out, "w") as f:
+            f.write(ddl)
+        print(f"💾 Saved to {out}")
+
+        if session is not None:
+            session.sql(ddl).collect()
+            print(f"✅ Created {SQL_SCORES_VIEW}")
+    finally:
+        if session is not None:
+            session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import time
+
+import numpy as np
+from sklearn.linear_model import SGDClassifier
+from sklearn.preprocessing import StandardScaler
+
+from feature_cache import compact_frame
+from feature_registry import (
+    FEATURE_COLUMNS,
+    FEATURES_TABLE,
+    SEGMENT_ENCODING,
+    SOURCE_COLUMNS as FEATURE_SOURCE_COLUMNS,
+    THRESHOLD_COLUMNS,
+    THRESHOLD_QUANTILE,
+    compute_features,
+)
+
+# Raw USER_FEATURES columns the feature matrix is built from, plus id and label
+SOURCE_COLUMNS = ["user_id", *FEATURE_SOURCE_COLUMNS, "is_churned"]
+BATCH_SIZE = 100_000
+# Users with user_id % HOLDOUT_MODULUS == 0 are held out (20%), so the split
+# is the same on every pass without storing it
+HOLDOUT_MODULUS = 5
+AUC_BINS = 1000
+
+
+class QuantileSketch:
+    """KLL-style streaming quantile sketch with bounded memory
+
+    Values enter level 0; when a level holds more than its capacity it is
+    sorted and every other value (from a random offset) is promoted to the next
+    level with twice the weight. Memory is O(k log(n / k)) whatever the stream
+    length, and rank error shrinks as k grows.
+    """
+
+    def __init__(self, k=512, seed=42):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.rng = np.random.default_rng(seed)
+        self.count = 0
+
+    def capacity(self, level):
+        # Lower levels get smaller capacities, as in KLL (c = 2/3)
+        depth = len(self.levels) - level - 1
+        return max(2, int(self.k * (2 / 3) ** depth))
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        self.count += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        level = 0
+        while level < len(self.levels):
+            if len(self.levels[level]) > self.capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                compacted = np.sort(self.levels[level])
+                promoted = compacted[self.rng.integers(2) :: 2]
+                self.levels[level] = np.empty(0)
+                self.levels[level + 1] = np.concatenate(
+                    [self.levels[level + 1], promoted]
+                )
+            level += 1
+
+    def quantile(self, q):
+        values = np.concatenate(self.levels)
+        weights = np.concatenate(
+            [np.full(len(items), 2.0**level) for level, items in enumerate(self.levels)]
+        )
+        order = np.argsort(values)
+        cumulative = np.cumsum(weights[order])
+        index = np.searchsorted(cumulative, q * cumulative[-1])
+        return float(values[order][min(index, len(values) - 1)])
+
+
+class BinnedAUC:
+    """ROC AUC from fixed-width score histograms, in constant memory"""
+
+    def __init__(self, bins=AUC_BINS):
+        self.positive = np.zeros(bins)
+        self.negative = np.zeros(bins)
+
+    def update(self, y, scores):
+        bins = np.minimum(
+            (scores * len(self.positive)).astype(int), len(self.positive) - 1
+        )
+        self.positive += np.bincount(bins[y == 1], minlength=len(self.positive))
+        self.negative += np.bincount(bins[y == 0], minlength=len(self.negative))
+
+    def score(self):
+        negatives_below = np.cumsum(self.negative) - self.negative
+        pairs = self.positive * (negatives_below + 0.5 * self.negative)
+        return float(pairs.sum() / (self.positive.sum() * self.negative.sum()))
+
+
+def iter_feature_batches(source, batch_size=BATCH_SIZE):
+    """USER_FEATURES in batches from a Snowpark session or a local Parquet file"""
+    if isinstance(source, str):
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(source)
+        columns = [
+            name
+            for name in parquet_file.schema_arrow.names
+            if name.lower() in SOURCE_COLUMNS
+        ]
+        for batch in parquet_file.iter_batches(batch_size, columns=columns):
+            df = compact_frame(batch.to_pandas())
+            df.columns = [column.lower() for column in df.columns]
+            yield df
+        return
+
+    table = source.table(FEATURES_TABLE).select(SOURCE_COLUMNS)
+    for df in table.to_pandas_batches():
+        df.columns = [column.lower() for column in df.columns]
+        for start in range(0, len(df), batch_size):
+            yield df.iloc[start : start + batch_size]
+
+
+def compact_batch(df, thresholds, segment_encoding=SEGMENT_ENCODING):
+    """(holdout mask, float32 feature matrix, int8 labels) for one batch"""
+    X = compute_features(df, thresholds, segment_encoding).astype(np.float32)
+    y = df["is_churned"].fillna(False).to_numpy().astype(np.int8)
+    holdout = (df["user_id"].to_numpy() % HOLDOUT_MODULUS) == 0
+    return holdout, X, y
+
+
+def peak_memory_mb():
+    """Peak resident memory of this process, or None where it is not available"""
+    try:
+        import resource
+    except ImportError:
+        # Windows has no resource module
+        return None
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def train_streaming(source, batch_size=BATCH_SIZE, epochs=3, seed=42):
+    """Train an SGD logistic model without holding USER_FEATURES in memory
+
+    Pass 1 sketches the threshold quantiles and counts the classes, pass 2
+    fits the scaler, each epoch then streams the batches through partial_fit
+    with balanced class weights, and a last pass scores the holdout users into
+    a binned AUC. Only one batch, the sketches and the model are in memory at
+    a time. Returns a model package.
+    """
+    start = time.perf_counter()
+    sketches = {column: QuantileSketch() for column in THRESHOLD_COLUMNS}
+    class_counts = np.zeros(2)
+    for df in iter_feature_batches(source, batch_size):
+        train = (df["user_id"].to_numpy() % HOLDOUT_MODULUS) != 0
+        for column, sketch in sketches.items():
+            sketch.update(df[column].to_numpy(dtype=np.float64)[train])
+        labels = df["is_churned"].fillna(False).to_numpy().astype(np.int8)[train]
+        class_counts += np.bincount(labels, minlength=2)
+    thresholds = {
+        column: sketch.quantile(THRESHOLD_QUANTILE)
+        for column, sketch in sketches.items()
+    }
+    print(f"📏 Sketched thresholds over {int(class_counts.sum()):,} rows: {thresholds}")
+    if class_counts.min() < 10:
+        raise ValueError("Need at least 10 samples of each class to train")
+    class_weight = class_counts.sum() / (2 * class_counts)
+
+    scaler = StandardScaler()
+    for df in iter_feature_batches(source, batch_size):
+        holdout, X, _ = compact_batch(df, thresholds)
+        scaler.partial_fit(X[~holdout])
+
+    model = SGDClassifier(loss="log_loss", alpha=1e-4, random_state=seed)
+    rng = np.random.default_rng(seed)
+    for epoch in range(epochs):
+        for df in iter_feature_batches(source, batch_size):
+            holdout, X, y = compact_batch(df, thresholds)
+            train = np.flatnonzero(~holdout)
+            rng.shuffle(train)
+            if len(train):
+                model.partial_fit(
+                    scaler.transform(X[train]),
+                    y[train],
+                    classes=[0, 1],
+                    sample_weight=class_weight[y[train]],
+                )
+        print(f"🔁 Epoch {epoch + 1}/{epochs} done")
+
+    auc = BinnedAUC()
+    for df in iter_feature_batches(source, batch_size):
+        holdout, X, y = compact_batch(df, thresholds)
+        if holdout.any():
+            auc.update(
+                y[holdout], model.predict_proba(scaler.transform(X[holdout]))[:, 1]
+            )
+    peak = peak_memory_mb()
+    print(
+        f"✅ Streaming training finished in {time.perf_counter() - start:.1f}s, "
+        f"holdout AUC {auc.score():.3f}"
+        + (f", peak memory {peak:.0f} MB" if peak is not None else "")
+    )
+    return {
+        "model": model,
+        "scaler": scaler,
+        "feature_columns": list(FEATURE_COLUMNS),
+        "model_type": "SGDClassifier",
+        "feature_thresholds": thresholds,
+        "segment_encoding": SEGMENT_ENCODING,
+    }
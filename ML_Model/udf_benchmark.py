@@ -0,0 +1,85 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import joblib
+import numpy as np
+import pandas as pd
+
+from churn_scoring import model_scaler, score_batch, score_row
+
+
+def load_feature_matrix(path, feature_columns, rows, seed=42):
+    """Feature rows to score: from a features file if given, else synthetic"""
+    if path:
+        df = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+        df.columns = [column.lower() for column in df.columns]
+        missing = [column for column in feature_columns if column not in df.columns]
+        if missing:
+            raise ValueError(f"{path} is missing feature columns {missing}")
+        X = df[feature_columns].to_numpy(dtype=np.float64)
+        return np.resize(X, (rows, X.shape[1]))
+
+    rng = np.random.default_rng(seed)
+    return rng.gamma(2.0, 50.0, size=(rows, len(feature_columns)))
+
+
+def rows_per_second(score, X):
+    start = time.perf_counter()
+    score(X)
+    return len(X) / (time.perf_counter() - start)
+
+
+def benchmark_scoring(
+    model_package, X, scalar_rows=2000, batch_sizes=(1024, 4096, 16384)
+):
+    """Compare scalar (one predict_proba per row) and batched scoring throughput"""
+    model = model_package["model"]
+    scaler = model_scaler(model_package)
+
+    results = {
+        "scalar": rows_per_second(
+            lambda rows: [score_row(model, scaler, row) for row in rows],
+            X[:scalar_rows],
+        )
+    }
+    for batch_size in batch_sizes:
+        results[f"batch {batch_size}"] = rows_per_second(
+            lambda rows: [
+                score_batch(model, scaler, rows[start : start + batch_size])
+                for start in range(0, len(rows), batch_size)
+            ],
+            X,
+        )
+
+    print("📊 Scoring throughput:")
+    for name, rate in results.items():
+        print(
+            f"   {name:<12} {rate:>12,.0f} rows/sec  ({rate / results['scalar']:.1f}x)"
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure scalar vs batched churn scoring throughput locally"
+    )
+    parser.add_argument("--model", default="improved_churn_model.pkl")
+    parser.add_argument("--features", help="CSV/Parquet file with feature columns")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--scalar-rows", type=int, default=2000)
+    parser.add_argument(
+        "--batch-sizes", type=int, nargs="+", default=[1024, 4096, 16384]
+    )
+    args = parser.parse_args()
+
+    model_package = joblib.load(args.model)
+    X = load_feature_matrix(args.features, model_package["feature_columns"], args.rows)
+    print(f"✅ Loaded {model_package['model_type']} model, scoring {len(X):,} rows")
+    benchmark_scoring(model_package, X, args.scalar_rows, args.batch_sizes)
+
+
+if __name__ == "__main__":
+    main()
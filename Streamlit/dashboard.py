@@ -129,11 +129,12 @@ def main():
     high_risk = load_data(
         session,
         """
-        SELECT u.user_id, u.email, u.customer_segment, f.total_spent
+        SELECT u.user_id, u.email, u.customer_segment, f.total_spent,
+               p.churn_probability, p.scored_at
         FROM RAW_DATA.RAW_USERS u
         JOIN FEATURES.USER_FEATURES f ON u.user_id = f.user_id
-        WHERE predict_churn(f.age, f.total_transactions, f.total_spent, 
-                           f.avg_transaction_amount, f.transaction_frequency) = TRUE
+        JOIN ML_MODELS.CHURN_PREDICTIONS p ON u.user_id = p.user_id
+        WHERE p.churn_prediction
         ORDER BY f.total_spent DESC
         LIMIT 20
     """,
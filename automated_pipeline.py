@@ -1,45 +1,332 @@
+import argparse
+import ast
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIRS = [
+    ROOT,
+    os.path.join(ROOT, "ML_Model"),
+    os.path.join(ROOT, "data_generation"),
+]
+sys.path.extend(SOURCE_DIRS[1:])
 import schedule
+import threading
 import time
 import logging
 from datetime import datetime
-from data_loader import load_data_to_snowflake
-from data_transformation import create_user_features
-from model_training import train_churn_model
-from deploy_model_udf import deploy_churn_prediction_udf
+from snowflake.snowpark import Session
+from snowflake_config import SNOWFLAKE_CONFIG
+from compress_csvs import file_hash
+from data_loader import (
+    TABLES,
+    load_incremental_data,
+    load_manifest,
+    local_files,
+)
+from feature_cache import change_token
+from model_artifact import model_version
+from incremental_features import WATERMARK_TABLE, main as refresh_user_features
+from model_training import MODEL_PATH, train_improved_churn_model
+from deploy_model_udf import deploy_improved_churn_model
+from batch_scoring import latest_model_version, main as batch_scoring_main
+from pipeline_dag import DONE, STATE_PATH, Stage, file_digest, run_dag
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DATA_DIR = "data"
+# Seconds a retrain may take, including its hyperparameter search
+RETRAIN_TIME_BUDGET = 45 * 60
+# "weekly" retrains once per ISO week; "on-change" retrains whenever
+# USER_FEATURES changed since the last successful retrain, which on a table
+# that gets new transactions daily means a full search every day
+RETRAIN_POLICIES = ("weekly", "on-change")
+RAW_TABLES = ["RAW_DATA.RAW_USERS", "RAW_DATA.RAW_TRANSACTIONS"]
+FEATURES_TABLE = "FEATURES.USER_FEATURES"
+METADATA_TABLE = "ML_MODELS.MODEL_METADATA"
 
-def run_daily_pipeline():
-    """Run the complete data pipeline"""
-    logger.info(f"Starting pipeline run at {datetime.now()}")
+# Entry modules of each stage; the code version covers every repo module
+# they import, directly or not
+STAGE_MODULES = {
+    "load_data": ["data_loader"],
+    "features": ["incremental_features"],
+    "age": ["incremental_features"],
+    "train": ["model_training"],
+    "deploy": ["deploy_model_udf"],
+    "score": ["batch_scoring"],
+}
 
-    try:
-        # Step 1: Load new data (in production, this would be incremental)
-        logger.info("Loading data...")
-        # load_data_to_snowflake()  # Comment out for demo
+# One session for fingerprint queries, shared by the stage threads
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
 
-        # Step 2: Transform data and create features
-        logger.info("Creating features...")
-        create_user_features()
 
-        # Step 3: Retrain model (weekly basis)
-        if datetime.now().weekday() == 0:  # Monday
-            logger.info("Retraining model...")
-            train_churn_model()
-            deploy_churn_prediction_udf()
+def _fingerprint_session():
+    # Callers hold _SESSION_LOCK
+    global _SESSION
+    if _SESSION is None:
+        _SESSION = Session.builder.configs(SNOWFLAKE_CONFIG).create()
+    return _SESSION
 
-        logger.info("Pipeline completed successfully!")
 
-    except Exception as e:
-        logger.error(f"Pipeline failed: {str(e)}")
+def table_tokens(*tables):
+    """Change tokens of Snowflake tables, from INFORMATION_SCHEMA metadata
+
+    A table that does not exist yet, e.g. on a fresh install, has token None.
+    """
+    with _SESSION_LOCK:
+        session = _fingerprint_session()
+        tokens = {}
+        for table in tables:
+            try:
+                tokens[table] = change_token(session, table)
+            except ValueError:
+                tokens[table] = None
+        return tokens
+
+
+def deployed_model_version():
+    """Version of the deployed model, or None before the first deployment"""
+    if table_tokens(METADATA_TABLE)[METADATA_TABLE] is None:
+        return None
+    with _SESSION_LOCK:
+        try:
+            return latest_model_version(_fingerprint_session())
+        except RuntimeError:
+            return None
+
+
+def close_fingerprint_session():
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is not None:
+            _SESSION.close()
+            _SESSION = None
+
+
+def _module_path(name):
+    for directory in SOURCE_DIRS:
+        path = os.path.join(directory, name.split(".")[0] + ".py")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def local_modules(*modules):
+    """Source files of the modules and every repo module they import
+
+    Imports inside functions count too, so lazily imported helpers are
+    covered. Third-party modules are not repo files and are left out.
+    """
+    pending = [_module_path(module) for module in modules]
+    seen = set()
+    while pending:
+        path = pending.pop()
+        if path is None or path in seen:
+            continue
+        seen.add(path)
+        with open(path) as f:
+            tree = ast.parse(f.read(), path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                pending += [_module_path(alias.name) for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                pending.append(_module_path(node.module))
+    return sorted(seen)
+
+
+def code_version(stage):
+    return file_digest(*local_modules(*STAGE_MODULES[stage]))
+
+
+def data_files_fingerprint(data_dir=DATA_DIR):
+    """Content hashes of the local data files, reusing the load manifest's
+
+    Files whose size and mtime match the manifest keep their recorded
+    checksum, so only new or changed files are read.
+    """
+    manifest = load_manifest(data_dir)
+    hashes = {}
+    for table in TABLES:
+        for path in local_files(data_dir, table):
+            entry = manifest.get(os.path.basename(path), {})
+            stat = os.stat(path)
+            if (
+                entry.get("loaded")
+                and entry.get("size") == stat.st_size
+                and entry.get("mtime") == stat.st_mtime
+            ):
+                hashes[os.path.basename(path)] = entry["checksum"]
+            else:
+                hashes[os.path.basename(path)] = file_hash(path)
+    return hashes
+
+
+def train_model():
+    # The search sizes itself to the window, however large the data
+    model_package, _ = train_improved_churn_model(
+        search=True, time_budget=RETRAIN_TIME_BUDGET
+    )
+    if model_package is None:
+        raise RuntimeError("Model training failed")
+
+
+def deploy_model():
+    if not deploy_improved_churn_model():
+        raise RuntimeError("Model deployment failed")
+
+
+def fold_features():
+    # Not the pipeline's own command line
+    refresh_user_features(["--step", "fold"])
+
+
+def age_features():
+    refresh_user_features(["--step", "age"])
+
+
+def score_churn_predictions():
+    # Deploying the first model scores everyone, so there is nothing to refresh
+    if deployed_model_version() is None:
+        logger.info("No deployed model yet, skipping scoring")
+        return
+    batch_scoring_main([])
+
+
+def build_daily_stages(retrain="weekly"):
+    """The daily pipeline as stages wired together by the artifacts they share
+
+    Each stage is fingerprinted by what it reads, so stages whose inputs did
+    not change since their last successful run are skipped. Scoring with the
+    deployed model only needs fresh features, so it runs alongside a retrain
+    instead of waiting for it; deploying the new model re-scores everyone
+    under the new version afterwards.
+    """
+
+    def retrain_trigger():
+        if retrain == "weekly":
+            year, week, _ = datetime.now().isocalendar()
+            return {"week": f"{year}-W{week:02d}"}
+        return table_tokens(FEATURES_TABLE)
+
+    return [
+        # Step 1: Load only the files not yet recorded in the load manifest
+        Stage(
+            "load_data",
+            load_incremental_data,
+            outputs=["raw_tables"],
+            fingerprint=lambda: {
+                "files": data_files_fingerprint(),
+                "code": code_version("load_data"),
+            },
+        ),
+        # Step 2: Fold new transactions into USER_FEATURES; a day without new
+        # data leaves the raw tables, and so this stage, unchanged
+        Stage(
+            "features",
+            fold_features,
+            inputs=["raw_tables"],
+            outputs=["folded_features"],
+            fingerprint=lambda: {
+                "tables": table_tokens(*RAW_TABLES),
+                "code": code_version("features"),
+            },
+        ),
+        # Date-relative columns move every day, even without new data; ageing
+        # them is O(users) and never reads the raw history
+        Stage(
+            "age",
+            age_features,
+            inputs=["folded_features"],
+            outputs=["user_features"],
+            fingerprint=lambda: {
+                "date": datetime.now().date().isoformat(),
+                "watermark": table_tokens(WATERMARK_TABLE),
+                "code": code_version("age"),
+            },
+        ),
+        # Step 3: Re-score users whose features changed since the last run
+        Stage(
+            "score",
+            score_churn_predictions,
+            inputs=["user_features"],
+            outputs=["churn_predictions"],
+            fingerprint=lambda: {
+                "tables": table_tokens(FEATURES_TABLE),
+                "model": deployed_model_version(),
+                "code": code_version("score"),
+            },
+        ),
+        # Step 4: Retrain weekly (or when the features changed), then deploy.
+        # A failed search is not worth repeating inside the same window
+        Stage(
+            "train",
+            train_model,
+            inputs=["user_features"],
+            outputs=["model_package"],
+            retries=0,
+            fingerprint=lambda: {
+                "trigger": retrain_trigger(),
+                "code": code_version("train"),
+                "time_budget": RETRAIN_TIME_BUDGET,
+            },
+        ),
+        Stage(
+            "deploy",
+            deploy_model,
+            inputs=["model_package"],
+            outputs=["churn_udfs"],
+            fingerprint=lambda: {
+                "model": model_version(MODEL_PATH),
+                "code": code_version("deploy"),
+            },
+        ),
+    ]
+
+
+def run_daily_pipeline(retrain="weekly", force=False):
+    """Run the complete data pipeline, skipping stages whose inputs are unchanged"""
+    logger.info(f"Starting pipeline run at {datetime.now()}")
+
+    try:
+        results = run_dag(
+            build_daily_stages(retrain), state_path=STATE_PATH, force=force
+        )
+    finally:
+        close_fingerprint_session()
+
+    failed = [name for name, r in results.items() if r["status"] not in DONE]
+    if failed:
+        logger.error(f"Pipeline finished with stages not completed: {failed}")
+    else:
+        logger.info("Pipeline completed successfully!")
+    return results
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Run the daily churn pipeline")
+    parser.add_argument(
+        "--run-once", action="store_true", help="run the pipeline now and exit"
+    )
+    parser.add_argument(
+        "--retrain",
+        choices=RETRAIN_POLICIES,
+        default="weekly",
+        help="retrain once a week, or whenever USER_FEATURES changes",
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="run every stage, even if up to date"
+    )
+    args = parser.parse_args()
+
+    if args.run_once:
+        run_daily_pipeline(args.retrain, args.force)
+        return
+
     # Schedule pipeline to run daily at 2 AM
-    schedule.every().day.at("02:00").do(run_daily_pipeline)
+    schedule.every().day.at("02:00").do(run_daily_pipeline, args.retrain, args.force)
 
     logger.info("Pipeline scheduler started...")
 
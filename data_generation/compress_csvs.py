@@ -1,15 +1,250 @@
+import argparse
 import gzip
-import shutil
+import hashlib
+import json
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 csv_files = ["data/users.csv", "data/products.csv", "data/transactions.csv"]
 
-for file in csv_files:
-    if os.path.exists(file):
-        output_path = file + ".gz"
-        with open(file, "rb") as f_in:
-            with gzip.open(output_path, "wb") as f_out:
-                shutil.copyfileobj(f_in, f_out)
-        print(f"Compressed: {output_path}")
-    else:
-        print(f"Not found: {file}")
+MANIFEST_NAME = ".compress_manifest.json"
+BLOCK_SIZE = 4 * 1024 * 1024
+# Uncompressed bytes of whole lines written between part-size checks
+LINE_BATCH_SIZE = 64 * 1024
+
+
+class _CountingFile:
+    """Raw output file that tracks how many compressed bytes were written"""
+
+    def __init__(self, path):
+        self.handle = open(path, "wb")
+        self.bytes_written = 0
+
+    def write(self, data):
+        self.bytes_written += len(data)
+        return self.handle.write(data)
+
+    def flush(self):
+        self.handle.flush()
+
+    def close(self):
+        self.handle.close()
+
+
+def _open_gzip(raw, level):
+    # mtime=0 keeps parts byte-identical across runs on the same input
+    return gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=level or 6, mtime=0)
+
+
+def _open_zstd(raw, level):
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("The zstd codec requires zstandard (pip install zstandard)")
+    compressor = zstandard.ZstdCompressor(level=level or 3)
+    return compressor.stream_writer(raw, closefd=False)
+
+
+# Both codecs are detected by COMPRESSION = AUTO in ML_MODELS.CSV_FORMAT
+CODECS = {
+    "gzip": (".gz", _open_gzip),
+    "zstd": (".zst", _open_zstd),
+}
+
+
+def file_hash(path):
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _output_path(path, out_dir, codec, part_index):
+    base = os.path.basename(path)
+    extension = CODECS[codec][0]
+    if part_index is None:
+        return os.path.join(out_dir, base + extension)
+    stem = base[:-4] if base.endswith(".csv") else base
+    return os.path.join(out_dir, f"{stem}_part{part_index:05d}.csv{extension}")
+
+
+def compress_file(path, out_dir=None, codec="gzip", level=None, part_size_mb=None):
+    """Compress one CSV, optionally split into parts of about part_size_mb
+
+    Parts are cut on line boundaries once their compressed size reaches the
+    target, checked every LINE_BATCH_SIZE bytes of lines against the bytes
+    the codec has actually written, and each part repeats the header row so
+    SKIP_HEADER = 1 still applies. A part is only started when there are
+    lines left for it. Fields must not contain embedded newlines.
+    """
+    out_dir = out_dir or os.path.dirname(path) or "."
+    os.makedirs(out_dir, exist_ok=True)
+    open_codec = CODECS[codec][1]
+    part_limit = part_size_mb * 1024 * 1024 if part_size_mb else None
+
+    outputs = []
+    raw = writer = None
+
+    def start_part(header):
+        nonlocal raw, writer
+        part_index = len(outputs) if part_limit else None
+        output_path = _output_path(path, out_dir, codec, part_index)
+        raw = _CountingFile(output_path)
+        writer = open_codec(raw, level)
+        outputs.append(output_path)
+        writer.write(header)
+
+    def finish_part():
+        writer.close()
+        raw.close()
+
+    with open(path, "rb") as f_in:
+        header = f_in.readline()
+        start_part(header)
+        if part_limit:
+            for lines in iter(lambda: f_in.readlines(LINE_BATCH_SIZE), []):
+                if raw.bytes_written >= part_limit:
+                    finish_part()
+                    start_part(header)
+                writer.write(b"".join(lines))
+        else:
+            for block in iter(lambda: f_in.read(BLOCK_SIZE), b""):
+                writer.write(block)
+        finish_part()
+
+    return outputs
+
+
+def _load_manifest(out_dir):
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+def _save_manifest(out_dir, manifest):
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+
+def _compress_if_changed(path, out_dir, codec, level, part_size_mb, previous, force):
+    settings = {"codec": codec, "level": level, "part_size_mb": part_size_mb}
+    content_hash = file_hash(path)
+    if (
+        not force
+        and previous
+        and previous["hash"] == content_hash
+        and previous["settings"] == settings
+        and all(os.path.exists(output) for output in previous["outputs"])
+    ):
+        return path, previous, None
+
+    start = time.perf_counter()
+    outputs = compress_file(path, out_dir, codec, level, part_size_mb)
+    elapsed = time.perf_counter() - start
+
+    # Drop parts left over from an earlier run that produced more of them
+    for stale in set(previous["outputs"] if previous else []) - set(outputs):
+        if os.path.exists(stale):
+            os.remove(stale)
+
+    entry = {"hash": content_hash, "settings": settings, "outputs": outputs}
+    return path, entry, elapsed
+
+
+def compress_csvs(
+    files=None,
+    out_dir=None,
+    codec="gzip",
+    level=None,
+    part_size_mb=None,
+    workers=None,
+    force=False,
+):
+    """Compress CSV files concurrently, skipping ones whose content is unchanged"""
+    files = files or csv_files
+    manifests = {}
+    results = {}
+
+    existing = [file for file in files if os.path.exists(file)]
+    for file in files:
+        if file not in existing:
+            print(f"Not found: {file}")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = []
+        for file in existing:
+            target_dir = out_dir or os.path.dirname(file) or "."
+            manifest = manifests.setdefault(target_dir, _load_manifest(target_dir))
+            futures.append(
+                pool.submit(
+                    _compress_if_changed,
+                    file,
+                    target_dir,
+                    codec,
+                    level,
+                    part_size_mb,
+                    manifest.get(os.path.abspath(file)),
+                    force,
+                )
+            )
+
+        for future in futures:
+            file, entry, elapsed = future.result()
+            target_dir = out_dir or os.path.dirname(file) or "."
+            manifests[target_dir][os.path.abspath(file)] = entry
+            results[file] = entry["outputs"]
+
+            if elapsed is None:
+                print(f"Unchanged, skipped: {file}")
+                continue
+            size_mb = os.path.getsize(file) / (1024 * 1024)
+            compressed_mb = sum(os.path.getsize(o) for o in entry["outputs"]) / (
+                1024 * 1024
+            )
+            print(
+                f"Compressed: {file} -> {len(entry['outputs'])} file(s), "
+                f"{size_mb:.1f} MB -> {compressed_mb:.1f} MB "
+                f"in {elapsed:.2f}s ({size_mb / max(elapsed, 1e-9):.1f} MB/s)"
+            )
+
+    for target_dir, manifest in manifests.items():
+        _save_manifest(target_dir, manifest)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compress CSV files for staging")
+    parser.add_argument("files", nargs="*", default=csv_files)
+    parser.add_argument("--out-dir", help="defaults to each file's directory")
+    parser.add_argument("--codec", choices=sorted(CODECS), default="gzip")
+    parser.add_argument("--level", type=int, help="compression level")
+    parser.add_argument(
+        "--part-size-mb",
+        type=int,
+        help="split into parts of about this many compressed MB",
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument(
+        "--force", action="store_true", help="recompress unchanged files"
+    )
+    args = parser.parse_args()
+
+    compress_csvs(
+        files=args.files,
+        out_dir=args.out_dir,
+        codec=args.codec,
+        level=args.level,
+        part_size_mb=args.part_size_mb,
+        workers=args.workers,
+        force=args.force,
+    )
+
+
+if __name__ == "__main__":
+    main()
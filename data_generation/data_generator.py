@@ -1,4 +1,8 @@
 # data_generator.py
+import gzip
+import io
+import os
+from functools import lru_cache
 import pandas as pd
 import numpy as np
 from faker import Faker
@@ -10,36 +14,40 @@ np.random.seed(42)
 
 
 # Generate Users
-def generate_users(n=10000):
+def generate_users(n=10000, start_id=1, faker=None, rng=None):
+    faker = faker or fake
+    rng = rng or random
     users = []
     for i in range(n):
         users.append(
             {
-                "user_id": i + 1,
-                "email": fake.email(),
-                "first_name": fake.first_name(),
-                "last_name": fake.last_name(),
-                "signup_date": fake.date_between(start_date="-2y", end_date="today"),
-                "country": fake.country(),
-                "age": random.randint(18, 70),
-                "customer_segment": random.choice(["Premium", "Standard", "Basic"]),
+                "user_id": start_id + i,
+                "email": faker.email(),
+                "first_name": faker.first_name(),
+                "last_name": faker.last_name(),
+                "signup_date": faker.date_between(start_date="-2y", end_date="today"),
+                "country": faker.country(),
+                "age": rng.randint(18, 70),
+                "customer_segment": rng.choice(["Premium", "Standard", "Basic"]),
             }
         )
     return pd.DataFrame(users)
 
 
 # Generate Products
-def generate_products(n=1000):
+def generate_products(n=1000, start_id=1, faker=None, rng=None):
+    faker = faker or fake
+    rng = rng or random
     categories = ["Electronics", "Clothing", "Books", "Home", "Sports"]
     products = []
     for i in range(n):
         products.append(
             {
-                "product_id": i + 1,
-                "product_name": fake.sentence(nb_words=3)[:-1],
-                "category": random.choice(categories),
-                "price": round(random.uniform(10, 500), 2),
-                "brand": fake.company(),
+                "product_id": start_id + i,
+                "product_name": faker.sentence(nb_words=3)[:-1],
+                "category": rng.choice(categories),
+                "price": round(rng.uniform(10, 500), 2),
+                "brand": faker.company(),
             }
         )
     return pd.DataFrame(products)
@@ -72,20 +80,296 @@ def generate_transactions(users_df, products_df, n=100000):
     return pd.DataFrame(transactions)
 
 
+CUSTOMER_SEGMENTS = ["Premium", "Standard", "Basic"]
+PRODUCT_CATEGORIES = ["Electronics", "Clothing", "Books", "Home", "Sports"]
+
+
+# Build vocabulary pools once so rows can be assembled by index sampling
+@lru_cache(maxsize=None)
+def build_vocabulary(seed=42, size=2000):
+    """Draw compact Faker pools of names, domains, countries, brands and words"""
+    faker = Faker()
+    faker.seed_instance(seed)
+
+    def pool(draw, limit=size):
+        return np.array(sorted({draw() for _ in range(limit)}), dtype=object)
+
+    return {
+        "first_names": pool(faker.first_name),
+        "last_names": pool(faker.last_name),
+        "domains": pool(faker.free_email_domain, 200),
+        "countries": pool(faker.country, 1000),
+        "brands": pool(faker.company),
+        "words": pool(faker.word),
+    }
+
+
+def _sample(rng, values, n):
+    return values[rng.integers(0, len(values), size=n)]
+
+
+# Generate Users (vocabulary pools)
+def generate_users_fast(n=10000, start_id=1, seed=42, vocabulary=None):
+    """Same columns as generate_users, assembled from vocabulary pools
+
+    Emails embed the user_id, so they stay unique however small the pools are.
+    """
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+    vocabulary = vocabulary or build_vocabulary()
+    user_ids = np.arange(start_id, start_id + n, dtype=np.int64)
+
+    first_names = pd.Series(_sample(rng, vocabulary["first_names"], n))
+    last_names = pd.Series(_sample(rng, vocabulary["last_names"], n))
+    domains = _sample(rng, vocabulary["domains"], n)
+    local_parts = (first_names.str.lower() + "." + last_names.str.lower()).str.replace(
+        r"[^a-z.]", "", regex=True
+    )
+    emails = local_parts + pd.Series(user_ids).astype(str) + "@" + domains
+
+    today = np.datetime64(datetime.now().date(), "D")
+    signup_dates = today - rng.integers(0, 2 * 365 + 1, size=n).astype("timedelta64[D]")
+
+    return pd.DataFrame(
+        {
+            "user_id": user_ids,
+            "email": emails,
+            "first_name": first_names,
+            "last_name": last_names,
+            "signup_date": signup_dates,
+            "country": _sample(rng, vocabulary["countries"], n),
+            "age": rng.integers(18, 71, size=n),
+            "customer_segment": _sample(rng, np.array(CUSTOMER_SEGMENTS), n),
+        }
+    )
+
+
+# Generate Products (vocabulary pools)
+def generate_products_fast(n=1000, start_id=1, seed=42, vocabulary=None):
+    """Same columns as generate_products, assembled from vocabulary pools"""
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+    vocabulary = vocabulary or build_vocabulary()
+
+    words = [pd.Series(_sample(rng, vocabulary["words"], n)) for _ in range(3)]
+    product_names = words[0].str.capitalize() + " " + words[1] + " " + words[2]
+
+    return pd.DataFrame(
+        {
+            "product_id": np.arange(start_id, start_id + n, dtype=np.int64),
+            "product_name": product_names,
+            "category": _sample(rng, np.array(PRODUCT_CATEGORIES), n),
+            "price": np.round(rng.uniform(10, 500, size=n), 2),
+            "brand": _sample(rng, vocabulary["brands"], n),
+        }
+    )
+
+
+PAYMENT_METHODS = ["Credit Card", "Debit Card", "PayPal", "Bank Transfer"]
+TRANSACTION_COLUMNS = [
+    "transaction_id",
+    "user_id",
+    "product_id",
+    "quantity",
+    "unit_price",
+    "total_amount",
+    "transaction_date",
+    "payment_method",
+]
+
+
+# Generate Transactions (vectorized)
+def generate_transactions_vectorized(
+    users_df, products_df, n=100000, seed=42, start_id=1, end_date=None
+):
+    """Generate transactions as whole NumPy arrays, reproducible from one seed
+
+    Prices are looked up by indexed gather instead of a per-row boolean mask, so
+    the cost is O(n) regardless of how many users and products exist. Output
+    columns match generate_transactions. Timestamps fall in the year before
+    end_date (midnight today by default), at one-second resolution.
+    """
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+
+    user_ids = users_df["user_id"].to_numpy()
+    product_ids = products_df["product_id"].to_numpy()
+    prices = products_df["price"].to_numpy()
+
+    product_idx = rng.integers(0, len(product_ids), size=n)
+    quantity = rng.integers(1, 6, size=n)
+    unit_price = prices[product_idx]
+
+    if end_date is None:
+        end_date = datetime.combine(datetime.now().date(), datetime.min.time())
+    end = np.datetime64(end_date, "s")
+    offsets = rng.integers(0, 365 * 24 * 3600, size=n)
+
+    return pd.DataFrame(
+        {
+            "transaction_id": np.arange(start_id, start_id + n, dtype=np.int64),
+            "user_id": user_ids[rng.integers(0, len(user_ids), size=n)],
+            "product_id": product_ids[product_idx],
+            "quantity": quantity,
+            "unit_price": unit_price,
+            "total_amount": np.round(unit_price * quantity, 2),
+            "transaction_date": end - offsets.astype("timedelta64[s]"),
+            "payment_method": np.array(PAYMENT_METHODS)[
+                rng.integers(0, len(PAYMENT_METHODS), size=n)
+            ],
+        },
+        columns=TRANSACTION_COLUMNS,
+    )
+
+
+# Stream transactions in fixed-size chunks
+def iter_transaction_chunks(
+    users_df, products_df, n, chunk_size=1_000_000, seed=42, start_id=1, end_date=None
+):
+    """Yield transaction DataFrames of at most chunk_size rows
+
+    Each chunk draws from its own Generator seeded with (seed, chunk start), so a
+    given row range always produces the same data however it is chunked or
+    distributed. Chunks are aligned to multiples of chunk_size; the last one
+    is generated at its own length, so its rows also depend on n.
+    """
+    if end_date is None:
+        end_date = datetime.combine(datetime.now().date(), datetime.min.time())
+
+    first = start_id - 1
+    last = first + n
+    chunk_start = first - first % chunk_size
+    while chunk_start < last:
+        chunk_stop = chunk_start + chunk_size
+        # Only the rows still needed; a short final chunk is not over-generated
+        chunk = generate_transactions_vectorized(
+            users_df,
+            products_df,
+            min(chunk_size, last - chunk_start),
+            seed=np.random.default_rng([seed, chunk_start]),
+            start_id=chunk_start + 1,
+            end_date=end_date,
+        )
+        yield chunk.iloc[max(first - chunk_start, 0) :]
+        chunk_start = chunk_stop
+
+
+class _GzipCsvWriter:
+    def __init__(self, path):
+        # mtime=0 keeps the gzip header, and therefore the file bytes, reproducible
+        self.raw = gzip.GzipFile(path, "wb", compresslevel=6, mtime=0)
+        self.handle = io.TextIOWrapper(self.raw, encoding="utf-8", newline="")
+        self.header = True
+
+    def write(self, df):
+        df.to_csv(self.handle, header=self.header, index=False)
+        self.header = False
+
+    def close(self):
+        self.handle.close()
+
+
+class _ParquetWriter:
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet output requires pyarrow (pip install pyarrow)")
+        self.pa = pa
+        self.pq = pq
+        self.path = path
+        self.writer = None
+
+    def write(self, df):
+        table = self.pa.Table.from_pandas(df, preserve_index=False)
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+FILE_FORMATS = {
+    "csv": (".csv.gz", _GzipCsvWriter),
+    "parquet": (".parquet", _ParquetWriter),
+}
+
+
+def part_file_name(table, index, file_format="csv"):
+    return f"{table}_part{index:05d}{FILE_FORMATS[file_format][0]}"
+
+
+def write_transactions_stream(
+    users_df,
+    products_df,
+    n,
+    out_dir="data",
+    chunk_size=1_000_000,
+    rows_per_file=10_000_000,
+    file_format="csv",
+    seed=42,
+    start_id=1,
+    end_date=None,
+    first_part=0,
+):
+    """Write n transactions to rolled-over part files without holding them in memory
+
+    Peak memory is bounded by chunk_size. A new file is started every
+    rows_per_file rows, numbered from first_part; returns the written paths.
+    """
+    if rows_per_file <= 0:
+        raise ValueError("rows_per_file must be positive")
+    os.makedirs(out_dir, exist_ok=True)
+    writer_class = FILE_FORMATS[file_format][1]
+
+    paths = []
+    writer = None
+    rows_in_file = 0
+    for chunk in iter_transaction_chunks(
+        users_df, products_df, n, chunk_size, seed, start_id, end_date
+    ):
+        while len(chunk):
+            if writer is None:
+                file_name = part_file_name(
+                    "transactions", first_part + len(paths), file_format
+                )
+                path = os.path.join(out_dir, file_name)
+                writer = writer_class(path)
+                paths.append(path)
+                rows_in_file = 0
+
+            take = min(len(chunk), rows_per_file - rows_in_file)
+            writer.write(chunk.iloc[:take])
+            chunk = chunk.iloc[take:]
+            rows_in_file += take
+
+            if rows_in_file == rows_per_file:
+                writer.close()
+                writer = None
+
+    if writer is not None:
+        writer.close()
+    return paths
+
+
 # Generate all datasets
 if __name__ == "__main__":
     print("Generating sample data...")
 
     users_df = generate_users(10000)
     products_df = generate_products(1000)
-    transactions_df = generate_transactions(users_df, products_df, 100000)
 
-    # Save to CSV
-    users_df.to_csv("users.csv", index=False)
-    products_df.to_csv("products.csv", index=False)
-    transactions_df.to_csv("transactions.csv", index=False)
+    # Save as gzip CSV part files in data/, the names data_loader looks for
+    os.makedirs("data", exist_ok=True)
+    for table, df in (("users", users_df), ("products", products_df)):
+        writer = _GzipCsvWriter(os.path.join("data", part_file_name(table, 0)))
+        writer.write(df)
+        writer.close()
+    transaction_files = write_transactions_stream(
+        users_df, products_df, 100000, out_dir="data"
+    )
 
     print("Data generation complete!")
     print(f"Users: {len(users_df)} records")
     print(f"Products: {len(products_df)} records")
-    print(f"Transactions: {len(transactions_df)} records")
+    print(f"Transactions: 100000 records in {len(transaction_files)} file(s)")
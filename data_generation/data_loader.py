@@ -1,90 +1,474 @@
 # data_loader.py
-import snowflake.connector
-from snowflake_setup.snowflake_config import SNOWFLAKE_CONFIG
+import argparse
+import glob
+import gzip
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from compress_csvs import BLOCK_SIZE, file_hash
 
-def load_data_to_snowflake():
-    # Connect to Snowflake
-    conn = snowflake.connector.connect(**SNOWFLAKE_CONFIG)
+STAGE = "@ML_MODELS.RAW_DATA_STAGE"
+FILE_FORMAT = "ML_MODELS.CSV_FORMAT"
+# Matches both single files and split parts written by compress_csvs.py
+COPY_PATTERN = ".*[.]csv[.](gz|zst)"
+LOAD_MANIFEST_NAME = "load_manifest.json"
+# COPY INTO accepts at most 1000 names in a FILES list
+COPY_FILES_LIMIT = 1000
+
+TABLES = {
+    "users": {
+        "name": "RAW_DATA.raw_users",
+        "key": "user_id",
+        "columns": [
+            ("user_id", "INTEGER"),
+            ("email", "STRING"),
+            ("first_name", "STRING"),
+            ("last_name", "STRING"),
+            ("signup_date", "DATE"),
+            ("country", "STRING"),
+            ("age", "INTEGER"),
+            ("customer_segment", "STRING"),
+        ],
+    },
+    "products": {
+        "name": "RAW_DATA.raw_products",
+        "key": "product_id",
+        "columns": [
+            ("product_id", "INTEGER"),
+            ("product_name", "STRING"),
+            ("category", "STRING"),
+            ("price", "FLOAT"),
+            ("brand", "STRING"),
+        ],
+    },
+    "transactions": {
+        "name": "RAW_DATA.raw_transactions",
+        # Append-only: delta files are added to the history as they arrive
+        "key": None,
+        "columns": [
+            ("transaction_id", "INTEGER"),
+            ("user_id", "INTEGER"),
+            ("product_id", "INTEGER"),
+            ("quantity", "INTEGER"),
+            ("unit_price", "FLOAT"),
+            ("total_amount", "FLOAT"),
+            ("transaction_date", "TIMESTAMP"),
+            ("payment_method", "STRING"),
+        ],
+    },
+}
+
+
+def column_ddl(table):
+    return ", ".join(f"{name} {type_}" for name, type_ in TABLES[table]["columns"])
+
+
+class RecordingConnection:
+    """Stand-in connection that records statements instead of running them"""
+
+    def __init__(self, echo=False):
+        self.statements = []
+        self.echo = echo
+
+    def cursor(self):
+        return _RecordingCursor(self)
+
+    def close(self):
+        pass
+
+
+class _RecordingCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, statement):
+        statement = " ".join(statement.split())
+        self.connection.statements.append(statement)
+        if self.connection.echo:
+            print(f"  {statement}")
+        return self
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        pass
+
+
+def create_connection():
+    import snowflake.connector
+    from snowflake_config import SNOWFLAKE_CONFIG
+
+    return snowflake.connector.connect(**SNOWFLAKE_CONFIG)
+
+
+def local_files(data_dir, table):
+    """Compressed files for a table, preferring split parts over a single file"""
+    parts = sorted(glob.glob(os.path.join(data_dir, f"{table}_part*.csv.*")))
+    if parts:
+        return parts
+    return sorted(glob.glob(os.path.join(data_dir, f"{table}.csv.*")))
+
+
+def _put_patterns(files):
+    # One wildcard PUT per file family lets the client upload them in parallel
+    patterns = set()
+    for path in files:
+        directory, name = os.path.split(path)
+        if "_part" in name:
+            name = name[: name.index("_part")] + "_part*" + name[name.index(".csv.") :]
+        patterns.add(os.path.join(directory, name).replace(os.sep, "/"))
+    return sorted(patterns)
+
+
+def _run_on_cursor(conn, statements):
     cursor = conn.cursor()
+    try:
+        for statement in statements:
+            cursor.execute(statement)
+    finally:
+        cursor.close()
+
+
+def _run_per_table(conn, statements_by_table, workers, on_success=None):
+    """Run each table's statements on its own cursor, tables concurrently"""
+    timings = {}
+
+    def run(table):
+        start = time.perf_counter()
+        _run_on_cursor(conn, statements_by_table[table])
+        timings[table] = time.perf_counter() - start
+        if on_success:
+            on_success(table)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(run, statements_by_table))
+    return timings
+
+
+def _report(phase, elapsed, timings):
+    details = ", ".join(f"{table} {seconds:.2f}s" for table, seconds in timings.items())
+    print(f"⏱️ {phase}: {elapsed:.2f}s ({details})")
+
+
+def count_rows(path):
+    """Data rows in a compressed CSV file, not counting the header"""
+    if path.endswith(".zst"):
+        import zstandard
+
+        handle = zstandard.open(path, "rb")
+    else:
+        handle = gzip.open(path, "rb")
+    with handle as f:
+        lines = sum(
+            block.count(b"\n") for block in iter(lambda: f.read(BLOCK_SIZE), b"")
+        )
+    return max(lines - 1, 0)
+
+
+def load_manifest(data_dir):
+    """Files already staged/loaded, keyed by file name"""
+    manifest_path = os.path.join(data_dir, LOAD_MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+def _save_load_manifest(data_dir, manifest):
+    manifest_path = os.path.join(data_dir, LOAD_MANIFEST_NAME)
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def _manifest_entry(table, path):
+    return {
+        "table": table,
+        "checksum": file_hash(path),
+        "rows": count_rows(path),
+        "staged": False,
+        "loaded": False,
+        **_file_signature(path),
+    }
+
+
+def _is_unchanged(entry, path):
+    # Size and mtime short-circuit the checksum so old files are not re-read
+    if all(entry.get(key) == value for key, value in _file_signature(path).items()):
+        return True
+    return entry["checksum"] == file_hash(path)
+
+
+def load_data_to_snowflake(
+    data_dir="data", put_parallel=8, conn=None, record_manifest=True
+):
+    """Stage every part file and bulk load the three raw tables concurrently"""
+    # Connect to Snowflake
+    owns_connection = conn is None
+    conn = conn or create_connection()
 
     try:
-        # Upload compressed files to the Snowflake stage in ML_MODELS schema
-        cursor.execute(
-            "PUT file://data/users.csv.gz @ML_MODELS.RAW_DATA_STAGE AUTO_COMPRESS=FALSE"
+        files = {table: local_files(data_dir, table) for table in TABLES}
+        missing = [table for table, paths in files.items() if not paths]
+        if missing:
+            raise FileNotFoundError(f"No compressed files in {data_dir} for {missing}")
+
+        # Upload compressed files to the table's folder in ML_MODELS.RAW_DATA_STAGE
+        start = time.perf_counter()
+        put_statements = {
+            table: [f"REMOVE {STAGE}/{table}/"]
+            + [
+                f"PUT file://{pattern} {STAGE}/{table}/ "
+                f"PARALLEL={put_parallel} AUTO_COMPRESS=FALSE OVERWRITE=TRUE"
+                for pattern in _put_patterns(paths)
+            ]
+            for table, paths in files.items()
+        }
+        timings = _run_per_table(conn, put_statements, len(TABLES))
+        _report("PUT", time.perf_counter() - start, timings)
+
+        # Create raw tables
+        start = time.perf_counter()
+        _run_on_cursor(
+            conn,
+            [
+                f"CREATE OR REPLACE TABLE {spec['name']} ({column_ddl(table)})"
+                for table, spec in TABLES.items()
+            ],
+        )
+        print(f"⏱️ CREATE: {time.perf_counter() - start:.2f}s")
+
+        # Load every staged file of each table with one pattern COPY per table
+        start = time.perf_counter()
+        copy_statements = {
+            table: [
+                f"""
+                COPY INTO {spec['name']}
+                FROM {STAGE}/{table}/
+                PATTERN = '{COPY_PATTERN}'
+                FILE_FORMAT = (FORMAT_NAME = {FILE_FORMAT})
+                """
+            ]
+            for table, spec in TABLES.items()
+        }
+        timings = _run_per_table(conn, copy_statements, len(TABLES))
+        _report("COPY", time.perf_counter() - start, timings)
+
+        # A full reload resets the history, so the manifest starts over too
+        loaded_at = datetime.now().isoformat(timespec="seconds")
+        manifest = {}
+        for table, paths in files.items():
+            for path in paths:
+                entry = _manifest_entry(table, path)
+                entry.update(staged=True, loaded=True, loaded_at=loaded_at)
+                manifest[os.path.basename(path)] = entry
+        if record_manifest:
+            _save_load_manifest(data_dir, manifest)
+
+        print("✅ Data loaded successfully into raw tables!")
+
+    finally:
+        if owns_connection:
+            conn.close()
+
+
+def _merge_statement(table, source):
+    """Upsert the delta on the table's key; for repeated keys the last row wins
+
+    "Last" is by source file name, then row number within the file, so the
+    newest part file's version of a row is merged on every run.
+    """
+    spec = TABLES[table]
+    key = spec["key"]
+    names = [name for name, _ in spec["columns"]]
+    updates = ", ".join(f"t.{name} = s.{name}" for name in names if name != key)
+    return f"""
+        MERGE INTO {spec['name']} t
+        USING (
+            SELECT * FROM {source}
+            QUALIFY ROW_NUMBER() OVER (
+                PARTITION BY {key} ORDER BY source_file DESC, source_row DESC
+            ) = 1
+        ) s
+        ON t.{key} = s.{key}
+        WHEN MATCHED THEN UPDATE SET {updates}
+        WHEN NOT MATCHED THEN INSERT ({", ".join(names)})
+        VALUES ({", ".join(f"s.{name}" for name in names)})
+    """
+
+
+def _incremental_statements(table, file_names):
+    spec = TABLES[table]
+    target = spec["name"] if spec["key"] is None else f"{spec['name']}_delta"
+
+    statements = []
+    source = f"{STAGE}/{table}/"
+    if spec["key"]:
+        # Where each row came from, so the MERGE can keep the last occurrence
+        statements.append(
+            f"CREATE OR REPLACE TEMPORARY TABLE {target} "
+            f"({column_ddl(table)}, source_file STRING, source_row INTEGER)"
         )
-        cursor.execute(
-            "PUT file://data/products.csv.gz @ML_MODELS.RAW_DATA_STAGE AUTO_COMPRESS=FALSE"
+        positions = ", ".join(f"${i + 1}" for i in range(len(spec["columns"])))
+        source = (
+            f"(SELECT {positions}, METADATA$FILENAME, METADATA$FILE_ROW_NUMBER "
+            f"FROM {source})"
         )
-        cursor.execute(
-            "PUT file://data/transactions.csv.gz @ML_MODELS.RAW_DATA_STAGE AUTO_COMPRESS=FALSE"
+    for offset in range(0, len(file_names), COPY_FILES_LIMIT):
+        batch = ", ".join(
+            f"'{name}'" for name in file_names[offset : offset + COPY_FILES_LIMIT]
         )
+        statements.append(f"""
+            COPY INTO {target}
+            FROM {source}
+            FILES = ({batch})
+            FILE_FORMAT = (FORMAT_NAME = {FILE_FORMAT})
+            """)
+    if spec["key"]:
+        statements.append(_merge_statement(table, target))
+        statements.append(f"DROP TABLE IF EXISTS {target}")
+    return statements
 
-        # Switch to RAW_DATA schema for creating raw tables
-        cursor.execute("USE SCHEMA RAW_DATA")
-
-        # Create raw_users table
-        cursor.execute("""
-            CREATE OR REPLACE TABLE raw_users (
-                user_id INTEGER,
-                email STRING,
-                first_name STRING,
-                last_name STRING,
-                signup_date DATE,
-                country STRING,
-                age INTEGER,
-                customer_segment STRING
-            )
-        """)
-
-        # Create raw_products table
-        cursor.execute("""
-            CREATE OR REPLACE TABLE raw_products (
-                product_id INTEGER,
-                product_name STRING,
-                category STRING,
-                price FLOAT,
-                brand STRING
-            )
-        """)
-
-        # Create raw_transactions table
-        cursor.execute("""
-            CREATE OR REPLACE TABLE raw_transactions (
-                transaction_id INTEGER,
-                user_id INTEGER,
-                product_id INTEGER,
-                quantity INTEGER,
-                unit_price FLOAT,
-                total_amount FLOAT,
-                transaction_date TIMESTAMP,
-                payment_method STRING
+
+def load_incremental_data(
+    data_dir="data", put_parallel=8, conn=None, record_manifest=True
+):
+    """Stage and load only the files the load manifest has not seen yet
+
+    Transactions are appended to raw_transactions; users and products are
+    upserted with MERGE on their keys. The manifest is updated per table as
+    each step succeeds, so a failed run can simply be repeated.
+    """
+    manifest = load_manifest(data_dir)
+    pending = {}
+    rewritten = []
+    for table in TABLES:
+        for path in local_files(data_dir, table):
+            name = os.path.basename(path)
+            entry = manifest.get(name)
+            if entry and _is_unchanged(entry, path):
+                entry.update(_file_signature(path))
+                if entry["loaded"]:
+                    continue
+            elif entry and entry["loaded"] and TABLES[table]["key"] is None:
+                # Appending it again would duplicate the rows already loaded
+                rewritten.append(name)
+                continue
+            else:
+                manifest[name] = _manifest_entry(table, path)
+            pending.setdefault(table, []).append(path)
+
+    if rewritten:
+        raise ValueError(
+            f"Files changed after they were loaded: {rewritten}. Their tables are "
+            "append-only, so write new data under new file names, or reload "
+            "everything with load_data_to_snowflake"
+        )
+
+    if not pending:
+        if record_manifest:
+            _save_load_manifest(data_dir, manifest)
+        print("✅ No new files to load")
+        return {}
+
+    # Connect to Snowflake
+    owns_connection = conn is None
+    conn = conn or create_connection()
+
+    def mark(table, **fields):
+        for path in pending[table]:
+            manifest[os.path.basename(path)].update(fields)
+
+    try:
+        _run_on_cursor(
+            conn,
+            [
+                f"CREATE TABLE IF NOT EXISTS {TABLES[table]['name']} "
+                f"({column_ddl(table)})"
+                for table in pending
+            ],
+        )
+
+        # Upload the files that were not staged by an earlier, failed run
+        start = time.perf_counter()
+        put_statements = {
+            table: [
+                f"PUT file://{path.replace(os.sep, '/')} {STAGE}/{table}/ "
+                f"PARALLEL={put_parallel} AUTO_COMPRESS=FALSE OVERWRITE=TRUE"
+                for path in paths
+                if not manifest[os.path.basename(path)]["staged"]
+            ]
+            for table, paths in pending.items()
+        }
+        timings = _run_per_table(
+            conn,
+            put_statements,
+            len(pending),
+            on_success=lambda table: mark(table, staged=True),
+        )
+        _report("PUT", time.perf_counter() - start, timings)
+
+        start = time.perf_counter()
+        load_statements = {
+            table: _incremental_statements(
+                table, [os.path.basename(path) for path in paths]
             )
-        """)
-
-        # Load data from ML_MODELS.RAW_DATA_STAGE into raw tables
-        cursor.execute("""
-            COPY INTO raw_users 
-            FROM @ML_MODELS.RAW_DATA_STAGE/users.csv.gz 
-            FILE_FORMAT = (FORMAT_NAME = ML_MODELS.CSV_FORMAT)
-        """)
-        cursor.execute("""
-            COPY INTO raw_products 
-            FROM @ML_MODELS.RAW_DATA_STAGE/products.csv.gz 
-            FILE_FORMAT = (FORMAT_NAME = ML_MODELS.CSV_FORMAT)
-        """)
-        cursor.execute("""
-            COPY INTO raw_transactions 
-            FROM @ML_MODELS.RAW_DATA_STAGE/transactions.csv.gz 
-            FILE_FORMAT = (FORMAT_NAME = ML_MODELS.CSV_FORMAT)
-        """)
+            for table, paths in pending.items()
+        }
+        loaded_at = datetime.now().isoformat(timespec="seconds")
+        timings = _run_per_table(
+            conn,
+            load_statements,
+            len(pending),
+            on_success=lambda table: mark(table, loaded=True, loaded_at=loaded_at),
+        )
+        _report("LOAD", time.perf_counter() - start, timings)
 
-        print("✅ Data loaded successfully into raw tables!")
+        rows = {
+            table: sum(manifest[os.path.basename(p)]["rows"] for p in paths)
+            for table, paths in pending.items()
+        }
+        print(f"✅ Incremental load complete: {rows}")
+        return rows
 
     finally:
-        cursor.close()
-        conn.close()
+        if record_manifest:
+            _save_load_manifest(data_dir, manifest)
+        if owns_connection:
+            conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load compressed CSVs into Snowflake")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--put-parallel", type=int, default=8)
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="print the statements instead of running them",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="load only files missing from the load manifest",
+    )
+    args = parser.parse_args()
+
+    conn = RecordingConnection(echo=True) if args.dry_run else None
+    load = load_incremental_data if args.incremental else load_data_to_snowflake
+    load(args.data_dir, args.put_parallel, conn=conn, record_manifest=not args.dry_run)
 
 
 if __name__ == "__main__":
-    load_data_to_snowflake()
+    main()
@@ -0,0 +1,177 @@
+# dataframe_ingest.py
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from data_generator import (
+    generate_products_fast,
+    generate_users_fast,
+    iter_transaction_chunks,
+)
+from data_loader import (
+    TABLES,
+    column_ddl,
+    create_connection,
+    load_data_to_snowflake,
+)
+
+PANDAS_TYPES = {
+    "INTEGER": "int64",
+    "FLOAT": "float64",
+    "STRING": "string",
+}
+
+
+def typed_frame(table, df):
+    """Cast a generator DataFrame to the raw table's column types
+
+    Dates become datetime.date values (Parquet DATE) and timestamps
+    datetime64[us] (Parquet TIMESTAMP), so nothing is rendered as text.
+    Column names are upper-cased to match the unquoted table columns.
+    """
+    columns = {}
+    for name, type_ in TABLES[table]["columns"]:
+        values = df[name]
+        if type_ == "DATE":
+            values = pd.to_datetime(values).dt.date
+        elif type_ == "TIMESTAMP":
+            values = pd.to_datetime(values).astype("datetime64[us]")
+        else:
+            values = values.astype(PANDAS_TYPES[type_])
+        columns[name.upper()] = values.reset_index(drop=True)
+    return pd.DataFrame(columns)
+
+
+def ingest_frames(conn, table, frames, overwrite=True, parallel=4):
+    """Bulk write an iterable of DataFrames into one raw table as Parquet batches
+
+    Each frame is written by write_pandas, which serializes it with pyarrow,
+    stages the Parquet file and loads it by column name. Only one frame is
+    held in memory at a time, so chunked generators can be passed directly.
+    """
+    from snowflake.connector.pandas_tools import write_pandas
+
+    schema, table_name = TABLES[table]["name"].split(".")
+
+    rows = 0
+    for frame in frames:
+        success, _, nrows, _ = write_pandas(
+            conn,
+            typed_frame(table, frame),
+            table_name.upper(),
+            schema=schema,
+            parallel=parallel,
+            compression="snappy",
+            quote_identifiers=False,
+            overwrite=overwrite and rows == 0,
+            use_logical_type=True,
+        )
+        if not success:
+            raise RuntimeError(f"write_pandas failed for {TABLES[table]['name']}")
+        rows += nrows
+    return rows
+
+
+def ingest_dataframes(users_df, products_df, transaction_frames, conn=None):
+    """Load the three raw tables straight from DataFrames, skipping CSV entirely"""
+    owns_connection = conn is None
+    conn = conn or create_connection()
+
+    try:
+        cursor = conn.cursor()
+        try:
+            for table, spec in TABLES.items():
+                cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS {spec['name']} ({column_ddl(table)})"
+                )
+        finally:
+            cursor.close()
+
+        rows = {}
+        for table, frames in (
+            ("users", [users_df]),
+            ("products", [products_df]),
+            ("transactions", transaction_frames),
+        ):
+            start = time.perf_counter()
+            rows[table] = ingest_frames(conn, table, frames)
+            print(
+                f"⏱️ {table}: {rows[table]:,} rows in "
+                f"{time.perf_counter() - start:.2f}s"
+            )
+        return rows
+
+    finally:
+        if owns_connection:
+            conn.close()
+
+
+def benchmark_ingest(n_users=10000, n_products=1000, n_transactions=1_000_000, seed=42):
+    """Time the CSV + gzip + PUT + COPY path against the Parquet path on one dataset"""
+    users_df = generate_users_fast(n_users, seed=seed)
+    products_df = generate_products_fast(n_products, seed=seed)
+    transactions_df = pd.concat(
+        iter_transaction_chunks(users_df, products_df, n_transactions, seed=seed),
+        ignore_index=True,
+    )
+
+    conn = create_connection()
+    try:
+        with tempfile.TemporaryDirectory() as data_dir:
+            start = time.perf_counter()
+            for table, df in (
+                ("users", users_df),
+                ("products", products_df),
+                ("transactions", transactions_df),
+            ):
+                df.to_csv(os.path.join(data_dir, f"{table}.csv.gz"), index=False)
+            load_data_to_snowflake(data_dir, conn=conn, record_manifest=False)
+            csv_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        ingest_dataframes(users_df, products_df, [transactions_df], conn=conn)
+        arrow_seconds = time.perf_counter() - start
+    finally:
+        conn.close()
+
+    print("📊 Ingest benchmark:")
+    print(f"   CSV path:     {csv_seconds:.2f}s")
+    print(f"   Parquet path: {arrow_seconds:.2f}s")
+    print(f"   Speedup:      {csv_seconds / arrow_seconds:.2f}x")
+    return csv_seconds, arrow_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Ingest generated DataFrames into RAW_DATA without CSV files"
+    )
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--transactions", type=int, default=100000)
+    parser.add_argument("--chunk-size", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--benchmark",
+        action="store_true",
+        help="compare against the CSV/PUT/COPY path on the same data",
+    )
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark_ingest(args.users, args.products, args.transactions, args.seed)
+        return
+
+    users_df = generate_users_fast(args.users, seed=args.seed)
+    products_df = generate_products_fast(args.products, seed=args.seed)
+    transaction_frames = iter_transaction_chunks(
+        users_df, products_df, args.transactions, args.chunk_size, seed=args.seed
+    )
+    ingest_dataframes(users_df, products_df, transaction_frames)
+    print("✅ Data ingested successfully into raw tables!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+# parallel_generator.py
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from faker import Faker
+
+from data_generator import (
+    FILE_FORMATS,
+    build_vocabulary,
+    generate_products,
+    generate_products_fast,
+    generate_users,
+    generate_users_fast,
+    part_file_name,
+    write_transactions_stream,
+)
+
+TABLE_CODES = {"users": 1, "products": 2, "transactions": 3}
+
+
+def shard_seed(master_seed, table, shard_index):
+    """Derive an independent 32-bit seed for one shard from the master seed"""
+    sequence = np.random.SeedSequence([master_seed, TABLE_CODES[table], shard_index])
+    return int(sequence.generate_state(1)[0])
+
+
+def shard_ranges(n, shard_size):
+    """Split 1..n into (shard_index, start_id, rows) ranges of shard_size rows"""
+    return [
+        (index, start + 1, min(shard_size, n - start))
+        for index, start in enumerate(range(0, n, shard_size))
+    ]
+
+
+def _write_frame(df, path, file_format):
+    writer = FILE_FORMATS[file_format][1](path)
+    try:
+        writer.write(df)
+    finally:
+        writer.close()
+
+
+def _generate_entity_shard(
+    table, shard_index, start_id, rows, master_seed, out_dir, file_format, fast
+):
+    seed = shard_seed(master_seed, table, shard_index)
+    if fast:
+        # Vocabulary pools come from the master seed so every shard shares them
+        generate = generate_users_fast if table == "users" else generate_products_fast
+        vocabulary = build_vocabulary(master_seed)
+        df = generate(rows, start_id=start_id, seed=seed, vocabulary=vocabulary)
+    else:
+        faker = Faker()
+        faker.seed_instance(seed)
+        rng = random.Random(seed)
+        generate = generate_users if table == "users" else generate_products
+        df = generate(rows, start_id=start_id, faker=faker, rng=rng)
+
+    path = os.path.join(out_dir, part_file_name(table, shard_index, file_format))
+    _write_frame(df, path, file_format)
+    return path, df if table == "products" else None
+
+
+def _generate_transaction_shard(
+    shard_index,
+    start_id,
+    rows,
+    n_users,
+    products_df,
+    master_seed,
+    out_dir,
+    file_format,
+    chunk_size,
+    end_date,
+):
+    users_df = pd.DataFrame({"user_id": np.arange(1, n_users + 1)})
+    # Chunks inside the shard are seeded from (master seed, chunk start), so a
+    # row's values depend only on its id and never on the shard layout
+    return write_transactions_stream(
+        users_df,
+        products_df,
+        rows,
+        out_dir=out_dir,
+        chunk_size=chunk_size,
+        rows_per_file=rows,
+        file_format=file_format,
+        seed=master_seed,
+        start_id=start_id,
+        end_date=end_date,
+        first_part=shard_index,
+    )[0]
+
+
+def generate_sharded(
+    n_users=10000,
+    n_products=1000,
+    n_transactions=100000,
+    out_dir="data",
+    workers=None,
+    seed=42,
+    shard_size=1_000_000,
+    entity_shard_size=50_000,
+    chunk_size=250_000,
+    file_format="csv",
+    end_date=None,
+    fast=False,
+):
+    """Generate all three datasets across a process pool, one file per shard
+
+    fast=True builds users and products from vocabulary pools instead of
+    per-row Faker calls.
+
+    Shard boundaries and seeds depend only on the shard sizes and seed, so the
+    output is byte-identical for any number of workers. shard_size must be a
+    multiple of chunk_size for transactions to keep that guarantee.
+    """
+    if shard_size % chunk_size:
+        raise ValueError("shard_size must be a multiple of chunk_size")
+    if end_date is None:
+        end_date = datetime.combine(datetime.now().date(), datetime.min.time())
+    os.makedirs(out_dir, exist_ok=True)
+
+    timings = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        start = time.perf_counter()
+        user_futures = [
+            pool.submit(
+                _generate_entity_shard,
+                "users",
+                index,
+                start_id,
+                rows,
+                seed,
+                out_dir,
+                file_format,
+                fast,
+            )
+            for index, start_id, rows in shard_ranges(n_users, entity_shard_size)
+        ]
+        product_futures = [
+            pool.submit(
+                _generate_entity_shard,
+                "products",
+                index,
+                start_id,
+                rows,
+                seed,
+                out_dir,
+                file_format,
+                fast,
+            )
+            for index, start_id, rows in shard_ranges(n_products, entity_shard_size)
+        ]
+
+        # Transactions only need product prices, so they can start while
+        # user shards are still being written
+        product_results = [future.result() for future in product_futures]
+        products_df = pd.concat([df for _, df in product_results], ignore_index=True)
+        timings["products"] = time.perf_counter() - start
+
+        transaction_futures = [
+            pool.submit(
+                _generate_transaction_shard,
+                index,
+                start_id,
+                rows,
+                n_users,
+                products_df[["product_id", "price"]],
+                seed,
+                out_dir,
+                file_format,
+                chunk_size,
+                end_date,
+            )
+            for index, start_id, rows in shard_ranges(n_transactions, shard_size)
+        ]
+
+        files = {
+            "users": [future.result()[0] for future in user_futures],
+            "products": [path for path, _ in product_results],
+        }
+        timings["users"] = time.perf_counter() - start
+        files["transactions"] = [future.result() for future in transaction_futures]
+        timings["transactions"] = time.perf_counter() - start
+
+    return files, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate sharded synthetic e-commerce data in parallel"
+    )
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--transactions", type=int, default=100000)
+    parser.add_argument("--out-dir", default="data")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--shard-size", type=int, default=1_000_000)
+    parser.add_argument("--entity-shard-size", type=int, default=50_000)
+    parser.add_argument("--chunk-size", type=int, default=250_000)
+    parser.add_argument("--format", choices=sorted(FILE_FORMATS), default="csv")
+    parser.add_argument(
+        "--fast",
+        action="store_true",
+        help="build users/products from vocabulary pools instead of Faker",
+    )
+    args = parser.parse_args()
+
+    print(f"Generating sample data with {args.workers} worker(s)...")
+    files, timings = generate_sharded(
+        n_users=args.users,
+        n_products=args.products,
+        n_transactions=args.transactions,
+        out_dir=args.out_dir,
+        workers=args.workers,
+        seed=args.seed,
+        shard_size=args.shard_size,
+        entity_shard_size=args.entity_shard_size,
+        chunk_size=args.chunk_size,
+        file_format=args.format,
+        fast=args.fast,
+    )
+
+    print("Data generation complete!")
+    for table, paths in files.items():
+        print(f"{table}: {len(paths)} file(s), done after {timings[table]:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
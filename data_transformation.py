@@ -2,6 +2,7 @@ from snowflake.snowpark import Session
 from snowflake.snowpark.functions import (
     col,
     count,
+    count_distinct,
     sum as sum_,
     avg,
     max as max_,
@@ -19,8 +20,8 @@ def create_session():
     return Session.builder.configs(SNOWFLAKE_CONFIG).create()
 
 
-def create_realistic_user_features(session):
-    """Create user-level features with realistic churn detection"""
+def build_user_features(session):
+    """User-level transaction features joined with demographics, before labels"""
 
     print("🔄 Loading base tables...")
     users = session.table("RAW_DATA.RAW_USERS")
@@ -74,6 +75,13 @@ def create_realistic_user_features(session):
             col("payment_method_count"),
         ]
     )
+    return user_features
+
+
+def create_realistic_user_features(session):
+    """Create user-level features with realistic churn detection"""
+
+    user_features = build_user_features(session)
 
     print("🎯 Creating realistic churn labels...")
     final_features_with_churn = user_features.with_column(
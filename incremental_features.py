@@ -0,0 +1,532 @@
+import argparse
+
+from snowflake.snowpark import Session
+from snowflake_config import SNOWFLAKE_CONFIG
+
+STATE_TABLE = "FEATURES.USER_FEATURE_STATE"
+WATERMARK_TABLE = "FEATURES.USER_FEATURE_WATERMARK"
+PAYMENT_BITS_TABLE = "FEATURES.PAYMENT_METHOD_BITS"
+DELTA_TABLE = "FEATURES.TRANSACTIONS_DELTA"
+TOUCHED_TABLE = "FEATURES.TOUCHED_USERS"
+WINDOW_REFRESH_TABLE = "FEATURES.USER_FEATURE_WINDOW_REFRESH"
+DAILY_COUNTS_TABLE = "FEATURES.USER_DAILY_TRANSACTIONS"
+FEATURES_TABLE = "FEATURES.USER_FEATURES"
+# Days of per-(user, day) counts kept for the date-weighted columns; older
+# transactions are rolled up into the per-user state
+RECENCY_HORIZON_DAYS = 365
+
+SETUP_QUERIES = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+        user_id INTEGER,
+        txn_count INTEGER,
+        id_count INTEGER,
+        total_spent FLOAT,
+        min_amount FLOAT,
+        max_amount FLOAT,
+        last_transaction_date DATE,
+        sum_day_number INTEGER,
+        payment_bits INTEGER,
+        old_count INTEGER,
+        old_sum_day_number INTEGER
+    )
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS {DAILY_COUNTS_TABLE} (
+        user_id INTEGER,
+        day DATE,
+        txn_count INTEGER
+    ) CLUSTER BY (day)
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE} (
+        last_transaction_id INTEGER,
+        refreshed_at TIMESTAMP
+    )
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS {WINDOW_REFRESH_TABLE} (
+        refreshed_on DATE
+    )
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS {PAYMENT_BITS_TABLE} (
+        payment_method STRING,
+        bit INTEGER
+    )
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS {FEATURES_TABLE} (
+        user_id INTEGER,
+        age INTEGER,
+        customer_segment STRING,
+        total_transactions INTEGER,
+        total_spent FLOAT,
+        avg_transaction_amount FLOAT,
+        max_transaction_amount FLOAT,
+        min_transaction_amount FLOAT,
+        transaction_frequency INTEGER,
+        days_since_last_transaction INTEGER,
+        transactions_last_30_days INTEGER,
+        avg_days_between_transactions FLOAT,
+        recency_score FLOAT,
+        payment_method_count INTEGER,
+        is_churned BOOLEAN
+    )
+    """,
+]
+
+# Day number of a date, so the average transaction age can be derived from a sum
+DAY_NUMBER = "DATEDIFF('day', '1970-01-01'::DATE, {})"
+# Same draw as the churn rule in create_realistic_user_features
+CHURN_DRAW = "UNIFORM(0::FLOAT, 1::FLOAT, RANDOM())"
+
+
+def create_session():
+    return Session.builder.configs(SNOWFLAKE_CONFIG).create()
+
+
+def _popcount_sql(column, bits):
+    return " + ".join(
+        f"BITAND(BITSHIFTRIGHT({column}, {bit}), 1)" for bit in range(max(bits, 1))
+    )
+
+
+def _capture_delta_queries(watermark):
+    # DDL commits implicitly, so the temporary tables are built before BEGIN
+    return [
+        f"""
+        CREATE OR REPLACE TEMPORARY TABLE {DELTA_TABLE} AS
+        SELECT * FROM RAW_DATA.RAW_TRANSACTIONS
+        WHERE transaction_id > {watermark}
+        """,
+        f"""
+        CREATE OR REPLACE TEMPORARY TABLE {TOUCHED_TABLE} AS
+        SELECT DISTINCT user_id FROM {DELTA_TABLE}
+        """,
+    ]
+
+
+def _fold_delta_queries():
+    """Fold the captured transactions' per-user aggregates into the state"""
+    return [
+        # Give payment methods seen for the first time the next free bits
+        f"""
+        INSERT INTO {PAYMENT_BITS_TABLE} (payment_method, bit)
+        SELECT
+            payment_method,
+            (SELECT COALESCE(MAX(bit), -1) FROM {PAYMENT_BITS_TABLE})
+                + ROW_NUMBER() OVER (ORDER BY payment_method)
+        FROM (
+            SELECT DISTINCT payment_method FROM {DELTA_TABLE}
+            WHERE payment_method IS NOT NULL
+            AND payment_method NOT IN (SELECT payment_method FROM {PAYMENT_BITS_TABLE})
+        )
+        """,
+        f"""
+        MERGE INTO {STATE_TABLE} s
+        USING (
+            SELECT
+                t.user_id,
+                COUNT(*) AS txn_count,
+                COUNT(t.transaction_id) AS id_count,
+                SUM(t.total_amount) AS total_spent,
+                MIN(t.total_amount) AS min_amount,
+                MAX(t.total_amount) AS max_amount,
+                MAX(t.transaction_date::DATE) AS last_transaction_date,
+                SUM({DAY_NUMBER.format("t.transaction_date::DATE")}) AS sum_day_number,
+                COALESCE(BITOR_AGG(BITSHIFTLEFT(1, b.bit)), 0) AS payment_bits
+            FROM {DELTA_TABLE} t
+            LEFT JOIN {PAYMENT_BITS_TABLE} b ON t.payment_method = b.payment_method
+            GROUP BY t.user_id
+        ) d
+        ON s.user_id = d.user_id
+        WHEN MATCHED THEN UPDATE SET
+            s.txn_count = s.txn_count + d.txn_count,
+            s.id_count = s.id_count + d.id_count,
+            s.total_spent = s.total_spent + d.total_spent,
+            s.min_amount = LEAST(s.min_amount, d.min_amount),
+            s.max_amount = GREATEST(s.max_amount, d.max_amount),
+            s.last_transaction_date = GREATEST(
+                s.last_transaction_date, d.last_transaction_date
+            ),
+            s.sum_day_number = s.sum_day_number + d.sum_day_number,
+            s.payment_bits = BITOR(s.payment_bits, d.payment_bits)
+        WHEN NOT MATCHED THEN INSERT (
+            user_id, txn_count, id_count, total_spent, min_amount, max_amount,
+            last_transaction_date, sum_day_number, payment_bits, old_count,
+            old_sum_day_number
+        ) VALUES (
+            d.user_id, d.txn_count, d.id_count, d.total_spent, d.min_amount,
+            d.max_amount, d.last_transaction_date, d.sum_day_number, d.payment_bits,
+            0, 0
+        )
+        """,
+        f"""
+        MERGE INTO {DAILY_COUNTS_TABLE} c
+        USING (
+            SELECT user_id, transaction_date::DATE AS day, COUNT(*) AS txn_count
+            FROM {DELTA_TABLE}
+            GROUP BY user_id, transaction_date::DATE
+        ) d
+        ON c.user_id = d.user_id AND c.day = d.day
+        WHEN MATCHED THEN UPDATE SET c.txn_count = c.txn_count + d.txn_count
+        WHEN NOT MATCHED THEN INSERT (user_id, day, txn_count)
+        VALUES (d.user_id, d.day, d.txn_count)
+        """,
+    ]
+
+
+def _roll_up_queries():
+    """Move daily counts past the horizon into the per-user state
+
+    Only the days crossing the horizon since the last run are read, so this
+    costs about one day of counts.
+    """
+    horizon = f"DATEADD('day', -{RECENCY_HORIZON_DAYS}, CURRENT_DATE())"
+    return [
+        f"""
+        MERGE INTO {STATE_TABLE} s
+        USING (
+            SELECT
+                user_id,
+                SUM(txn_count) AS old_count,
+                SUM(txn_count * {DAY_NUMBER.format("day")}) AS old_sum_day_number
+            FROM {DAILY_COUNTS_TABLE}
+            WHERE day < {horizon}
+            GROUP BY user_id
+        ) o
+        ON s.user_id = o.user_id
+        WHEN MATCHED THEN UPDATE SET
+            s.old_count = s.old_count + o.old_count,
+            s.old_sum_day_number = s.old_sum_day_number + o.old_sum_day_number
+        """,
+        f"DELETE FROM {DAILY_COUNTS_TABLE} WHERE day < {horizon}",
+    ]
+
+
+def _windowed_sql(users=None):
+    """transactions_last_30_days and recency_score per user, from the daily counts
+
+    Both weight each transaction by its age as of today. The daily counts
+    only span RECENCY_HORIZON_DAYS, so this costs O(user-days in the horizon)
+    however long the history is. Transactions rolled up past the horizon
+    contribute to recency_score at their mean age; each weighs less than
+    1 / RECENCY_HORIZON_DAYS, so the difference from an exact rescan is small.
+    users limits the result to the user_ids in that table.
+    """
+    days = "DATEDIFF('day', c.day, CURRENT_DATE())"
+    user_filter = f"JOIN {users} t ON c.user_id = t.user_id" if users else ""
+    state_filter = f"JOIN {users} t ON s.user_id = t.user_id" if users else ""
+    old_age = (
+        f"{DAY_NUMBER.format('CURRENT_DATE()')} - s.old_sum_day_number / s.old_count"
+    )
+    return f"""
+        SELECT
+            s.user_id,
+            COALESCE(w.last_30, 0) AS transactions_last_30_days,
+            (
+                COALESCE(w.recency_sum, 0)
+                + IFF(s.old_count > 0, s.old_count / ({old_age} + 1), 0)
+            ) / s.txn_count AS recency_score
+        FROM {STATE_TABLE} s
+        {state_filter}
+        LEFT JOIN (
+            SELECT
+                c.user_id,
+                SUM(IFF(c.day >= DATEADD('day', -30, CURRENT_DATE()), c.txn_count, 0))
+                    AS last_30,
+                SUM(c.txn_count / ({days} + 1.0)) AS recency_sum
+            FROM {DAILY_COUNTS_TABLE} c
+            {user_filter}
+            GROUP BY c.user_id
+        ) w ON s.user_id = w.user_id
+    """
+
+
+def _refresh_touched_query(payment_bits):
+    """Rebuild USER_FEATURES rows for touched users from the state
+
+    Everything except transactions_last_30_days and recency_score comes
+    straight from the state; those two come from the touched users' daily
+    counts, so no raw transaction history is read.
+    """
+    return f"""
+    MERGE INTO {FEATURES_TABLE} f
+    USING (
+        WITH windowed AS ({_windowed_sql(TOUCHED_TABLE)}),
+        refreshed AS (
+            SELECT
+                s.user_id,
+                u.age,
+                u.customer_segment,
+                s.txn_count AS total_transactions,
+                s.total_spent,
+                s.total_spent / s.txn_count AS avg_transaction_amount,
+                s.max_amount AS max_transaction_amount,
+                s.min_amount AS min_transaction_amount,
+                s.id_count AS transaction_frequency,
+                DATEDIFF('day', s.last_transaction_date, CURRENT_DATE())
+                    AS days_since_last_transaction,
+                w.transactions_last_30_days,
+                {DAY_NUMBER.format("CURRENT_DATE()")} - s.sum_day_number / s.txn_count
+                    AS avg_days_between_transactions,
+                w.recency_score,
+                {_popcount_sql("s.payment_bits", payment_bits)}
+                    AS payment_method_count
+            FROM {STATE_TABLE} s
+            JOIN {TOUCHED_TABLE} t ON s.user_id = t.user_id
+            JOIN RAW_DATA.RAW_USERS u ON s.user_id = u.user_id
+            JOIN windowed w ON s.user_id = w.user_id
+        )
+        SELECT
+            *,
+            (days_since_last_transaction > 90 AND {CHURN_DRAW} > 0.7)
+            OR (customer_segment = 'Basic' AND {CHURN_DRAW} > 0.6)
+            OR (age > 60 AND {CHURN_DRAW} > 0.8)
+                AS is_churned
+        FROM refreshed
+    ) n
+    ON f.user_id = n.user_id
+    WHEN MATCHED THEN UPDATE SET
+        f.age = n.age,
+        f.customer_segment = n.customer_segment,
+        f.total_transactions = n.total_transactions,
+        f.total_spent = n.total_spent,
+        f.avg_transaction_amount = n.avg_transaction_amount,
+        f.max_transaction_amount = n.max_transaction_amount,
+        f.min_transaction_amount = n.min_transaction_amount,
+        f.transaction_frequency = n.transaction_frequency,
+        f.days_since_last_transaction = n.days_since_last_transaction,
+        f.transactions_last_30_days = n.transactions_last_30_days,
+        f.avg_days_between_transactions = n.avg_days_between_transactions,
+        f.recency_score = n.recency_score,
+        f.payment_method_count = n.payment_method_count,
+        f.is_churned = n.is_churned
+    WHEN NOT MATCHED THEN INSERT (
+        user_id, age, customer_segment, total_transactions, total_spent,
+        avg_transaction_amount, max_transaction_amount, min_transaction_amount,
+        transaction_frequency, days_since_last_transaction,
+        transactions_last_30_days, avg_days_between_transactions,
+        recency_score, payment_method_count, is_churned
+    ) VALUES (
+        n.user_id, n.age, n.customer_segment, n.total_transactions, n.total_spent,
+        n.avg_transaction_amount, n.max_transaction_amount, n.min_transaction_amount,
+        n.transaction_frequency, n.days_since_last_transaction,
+        n.transactions_last_30_days, n.avg_days_between_transactions,
+        n.recency_score, n.payment_method_count, n.is_churned
+    )
+    """
+
+
+def _age_from_state_query():
+    """Move every user's date-relative columns that the state covers to today
+
+    days_since_last_transaction and avg_days_between_transactions only need
+    the last transaction date and the day-number sum, so this is O(users)
+    and keeps inactive users ageing. A user crossing 90 days of inactivity
+    gets the churn rule's inactivity draw, as a full rebuild would.
+    """
+    return f"""
+    MERGE INTO {FEATURES_TABLE} f
+    USING (
+        SELECT
+            user_id,
+            DATEDIFF('day', last_transaction_date, CURRENT_DATE())
+                AS days_since_last_transaction,
+            {DAY_NUMBER.format("CURRENT_DATE()")} - sum_day_number / txn_count
+                AS avg_days_between_transactions
+        FROM {STATE_TABLE}
+    ) n
+    ON f.user_id = n.user_id
+    WHEN MATCHED AND f.days_since_last_transaction <> n.days_since_last_transaction
+    THEN UPDATE SET
+        f.is_churned = f.is_churned OR (
+            f.days_since_last_transaction <= 90
+            AND n.days_since_last_transaction > 90
+            AND {CHURN_DRAW} > 0.7
+        ),
+        f.days_since_last_transaction = n.days_since_last_transaction,
+        f.avg_days_between_transactions = n.avg_days_between_transactions
+    """
+
+
+def _window_refresh_query():
+    """Recompute the 30-day count and recency score for every user
+
+    Both move with the date, so they are re-derived from the daily counts
+    (never the raw history) at most once a day.
+    """
+    return f"""
+    MERGE INTO {FEATURES_TABLE} f
+    USING ({_windowed_sql()}) n
+    ON f.user_id = n.user_id
+    WHEN MATCHED THEN UPDATE SET
+        f.transactions_last_30_days = n.transactions_last_30_days,
+        f.recency_score = n.recency_score
+    """
+
+
+def _table_exists(session, table):
+    schema, name = table.upper().split(".")
+    return bool(session.sql(f"""
+        SELECT COUNT(*) AS n FROM INFORMATION_SCHEMA.TABLES
+        WHERE table_schema = '{schema}' AND table_name = '{name}'
+        """).collect()[0]["N"])
+
+
+def setup_feature_state(session):
+    """Create the state tables, rebuilding state saved without daily counts"""
+    if _table_exists(session, STATE_TABLE) and not _table_exists(
+        session, DAILY_COUNTS_TABLE
+    ):
+        print("⚠️ Feature state predates the daily counts, rebuilding it once...")
+        reset_feature_state(session)
+    for query in SETUP_QUERIES:
+        session.sql(query).collect()
+
+
+def age_user_features(session):
+    """Bring date-relative columns up to date for users without new transactions
+
+    The state-derived columns are refreshed on every run; the windowed ones
+    once per day, tracked in WINDOW_REFRESH_TABLE, after rolling daily counts
+    past the horizon into the state. Every step is O(users) or reads only the
+    bounded daily counts. Returns whether the daily window refresh ran.
+    """
+    setup_feature_state(session)
+    print("📅 Ageing date-relative features for all users...")
+    session.sql(_age_from_state_query()).collect()
+
+    refreshed_today = session.sql(f"""
+        SELECT COUNT(*) AS n FROM {WINDOW_REFRESH_TABLE}
+        WHERE refreshed_on >= CURRENT_DATE()
+        """).collect()[0]["N"]
+    if refreshed_today:
+        return False
+
+    print("🔄 Recomputing 30-day counts and recency scores...")
+    session.sql("BEGIN").collect()
+    try:
+        for query in _roll_up_queries():
+            session.sql(query).collect()
+        session.sql(_window_refresh_query()).collect()
+        session.sql(f"DELETE FROM {WINDOW_REFRESH_TABLE}").collect()
+        session.sql(
+            f"INSERT INTO {WINDOW_REFRESH_TABLE} (refreshed_on) SELECT CURRENT_DATE()"
+        ).collect()
+        session.sql("COMMIT").collect()
+    except Exception:
+        session.sql("ROLLBACK").collect()
+        raise
+    return True
+
+
+def fold_new_transactions(session):
+    """Fold new transactions into the per-user state and refresh touched users
+
+    The state holds counts, sums, min/max, the last transaction date, a sum of
+    transaction day numbers and a payment-method bitset per user, all of which
+    merge by addition, LEAST/GREATEST or BITOR, plus per-(user, day) counts
+    for the date-weighted columns. Only transactions above the stored
+    transaction_id watermark are read, and only users that appear in them get
+    new USER_FEATURES rows. Returns the number of touched users.
+    """
+    setup_feature_state(session)
+
+    watermark = session.sql(
+        f"SELECT COALESCE(MAX(last_transaction_id), 0) AS wm FROM {WATERMARK_TABLE}"
+    ).collect()[0]["WM"]
+    print(f"🔖 Transaction watermark: {watermark}")
+
+    for query in _capture_delta_queries(watermark):
+        session.sql(query).collect()
+
+    delta = session.sql(f"""
+        SELECT COUNT(*) AS rows, MAX(transaction_id) AS max_id,
+            (SELECT COUNT(*) FROM {TOUCHED_TABLE}) AS users
+        FROM {DELTA_TABLE}
+        """).collect()[0]
+    print(f"   {delta['ROWS']} new transactions, {delta['USERS']} touched users")
+    if delta["ROWS"]:
+        _fold_delta(session, delta)
+    else:
+        print("✅ No new transactions to fold")
+    return delta["USERS"]
+
+
+def refresh_user_features_incremental(session):
+    """Fold new transactions, then age every user's date-relative columns"""
+    touched = fold_new_transactions(session)
+    age_user_features(session)
+    print("✅ Incremental feature refresh complete!")
+    return touched
+
+
+def _fold_delta(session, delta):
+    # State, features and watermark move together or not at all
+    session.sql("BEGIN").collect()
+    try:
+        print("📊 Folding new transactions into user state...")
+        for query in _fold_delta_queries():
+            session.sql(query).collect()
+
+        payment_bits = session.sql(
+            f"SELECT COUNT(*) AS n FROM {PAYMENT_BITS_TABLE}"
+        ).collect()[0]["N"]
+
+        print("🔄 Refreshing features for touched users...")
+        session.sql(_refresh_touched_query(payment_bits)).collect()
+
+        session.sql(f"DELETE FROM {WATERMARK_TABLE}").collect()
+        session.sql(f"""
+            INSERT INTO {WATERMARK_TABLE} (last_transaction_id, refreshed_at)
+            SELECT {delta['MAX_ID']}, CURRENT_TIMESTAMP()
+            """).collect()
+        session.sql("COMMIT").collect()
+    except Exception:
+        session.sql("ROLLBACK").collect()
+        raise
+
+
+def reset_feature_state(session):
+    """Drop the state so the next refresh rebuilds it from the full history"""
+    for table in (
+        STATE_TABLE,
+        DAILY_COUNTS_TABLE,
+        WATERMARK_TABLE,
+        PAYMENT_BITS_TABLE,
+        WINDOW_REFRESH_TABLE,
+    ):
+        session.sql(f"DROP TABLE IF EXISTS {table}").collect()
+    print("🧹 Feature state reset")
+
+
+STEPS = {
+    "all": refresh_user_features_incremental,
+    "fold": fold_new_transactions,
+    "age": age_user_features,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh USER_FEATURES incrementally")
+    parser.add_argument(
+        "--step",
+        choices=sorted(STEPS),
+        default="all",
+        help="fold new transactions, age date-relative columns, or both",
+    )
+    args = parser.parse_args(argv)
+
+    session = create_session()
+
+    try:
+        print("🚀 Starting incremental feature refresh...")
+        STEPS[args.step](session)
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+import argparse
+import glob
+import os
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+TRANSACTION_COLUMNS = [
+    "transaction_id",
+    "user_id",
+    "total_amount",
+    "transaction_date",
+    "payment_method",
+]
+
+# Same columns, in the same order, as data_transformation.build_user_features
+FEATURE_COLUMNS = [
+    "user_id",
+    "age",
+    "customer_segment",
+    "total_transactions",
+    "total_spent",
+    "avg_transaction_amount",
+    "max_transaction_amount",
+    "min_transaction_amount",
+    "transaction_frequency",
+    "days_since_last_transaction",
+    "transactions_last_30_days",
+    "avg_days_between_transactions",
+    "recency_score",
+    "payment_method_count",
+]
+
+SUM_STATE = ["count", "id_count", "sum_amount", "last_30", "sum_days", "sum_recency"]
+MIN_STATE = ["min_amount", "min_days"]
+MAX_STATE = ["max_amount"]
+
+
+def find_files(data_dir, table):
+    """Part files for a table, else the single compressed, plain or Parquet file"""
+    for pattern in (
+        f"{table}_part*.csv.gz",
+        f"{table}_part*.parquet",
+        f"{table}.csv.gz",
+        f"{table}.csv",
+        f"{table}.parquet",
+    ):
+        files = sorted(glob.glob(os.path.join(data_dir, pattern)))
+        if files:
+            return files
+    raise FileNotFoundError(f"No {table} files found in {data_dir}")
+
+
+def read_table(data_dir, table, columns=None):
+    frames = [
+        (
+            pd.read_parquet(path, columns=columns)
+            if path.endswith(".parquet")
+            else pd.read_csv(path, usecols=columns)
+        )
+        for path in find_files(data_dir, table)
+    ]
+    return pd.concat(frames, ignore_index=True)
+
+
+def iter_transaction_chunks(data_dir, chunksize=5_000_000):
+    """Stream only the columns the features need, chunksize rows at a time"""
+    for path in find_files(data_dir, "transactions"):
+        if path.endswith(".parquet"):
+            import pyarrow.parquet as pq
+
+            parquet_file = pq.ParquetFile(path)
+            for batch in parquet_file.iter_batches(chunksize, TRANSACTION_COLUMNS):
+                yield batch.to_pandas()
+        else:
+            yield from pd.read_csv(
+                path, usecols=TRANSACTION_COLUMNS, chunksize=chunksize
+            )
+
+
+class PaymentMethodBits:
+    """Stable bit position per payment method, so bitsets from any chunk can be ORed"""
+
+    def __init__(self, methods=()):
+        self.positions = {method: bit for bit, method in enumerate(methods)}
+
+    def encode(self, methods):
+        for method in pd.unique(methods.dropna()):
+            if method not in self.positions:
+                if len(self.positions) == 63:
+                    raise ValueError("More than 63 payment methods")
+                self.positions[method] = len(self.positions)
+        positions = methods.map(self.positions)
+        bits = np.left_shift(np.int64(1), positions.fillna(0).to_numpy(np.int64))
+        return np.where(methods.notna().to_numpy(), bits, 0)
+
+
+def aggregate_chunk(chunk, as_of, payment_bits):
+    """Mergeable per-user state for one chunk of transactions
+
+    days mirrors DATEDIFF('day', transaction_date, CURRENT_DATE()), which counts
+    date boundaries rather than elapsed 24-hour periods.
+    """
+    transaction_days = pd.to_datetime(chunk["transaction_date"]).dt.normalize()
+    days = (pd.Timestamp(as_of) - transaction_days).dt.days.to_numpy()
+    amount = chunk["total_amount"].to_numpy(dtype=np.float64)
+
+    frame = pd.DataFrame(
+        {
+            "user_id": chunk["user_id"].to_numpy(),
+            "count": 1,
+            "id_count": chunk["transaction_id"].notna().to_numpy(dtype=np.int64),
+            "sum_amount": amount,
+            "min_amount": amount,
+            "max_amount": amount,
+            "min_days": days,
+            "last_30": (days <= 30).astype(np.int64),
+            "sum_days": days,
+            "sum_recency": 1.0 / (days + 1),
+        }
+    )
+    grouped = frame.groupby("user_id", sort=False)
+    state = pd.concat(
+        [
+            grouped[SUM_STATE].sum(),
+            grouped[MIN_STATE].min(),
+            grouped[MAX_STATE].max(),
+        ],
+        axis=1,
+    )
+
+    # A sum of distinct powers of two is their bitwise OR
+    pairs = pd.DataFrame(
+        {
+            "user_id": frame["user_id"],
+            "bits": payment_bits.encode(chunk["payment_method"]),
+        }
+    ).drop_duplicates()
+    state["payment_bits"] = pairs.groupby("user_id", sort=False)["bits"].sum()
+    return state
+
+
+def merge_states(left, right):
+    """Combine two per-user states; every column is a sum, min, max or bitwise OR"""
+    if left is None:
+        return right
+    index = left.index.union(right.index)
+    left = left.reindex(index)
+    right = right.reindex(index)
+
+    merged = pd.DataFrame(index=index)
+    for column in SUM_STATE:
+        merged[column] = left[column].fillna(0) + right[column].fillna(0)
+    for column in MIN_STATE:
+        merged[column] = np.fmin(left[column], right[column])
+    for column in MAX_STATE:
+        merged[column] = np.fmax(left[column], right[column])
+    merged["payment_bits"] = np.bitwise_or(
+        left["payment_bits"].fillna(0).astype(np.int64),
+        right["payment_bits"].fillna(0).astype(np.int64),
+    )
+    return merged
+
+
+def popcount(values):
+    values = np.asarray(values, dtype=np.uint64)
+    counts = np.zeros(values.shape, dtype=np.int64)
+    for bit in range(64):
+        counts += ((values >> np.uint64(bit)) & np.uint64(1)).astype(np.int64)
+    return counts
+
+
+def finalize_features(state, users_df):
+    """Turn per-user state into the USER_FEATURES columns (without is_churned)"""
+    count = state["count"]
+    features = pd.DataFrame(
+        {
+            "total_transactions": count.astype(np.int64),
+            "total_spent": state["sum_amount"],
+            "avg_transaction_amount": state["sum_amount"] / count,
+            "max_transaction_amount": state["max_amount"],
+            "min_transaction_amount": state["min_amount"],
+            "transaction_frequency": state["id_count"].astype(np.int64),
+            "days_since_last_transaction": state["min_days"].astype(np.int64),
+            "transactions_last_30_days": state["last_30"].astype(np.int64),
+            "avg_days_between_transactions": state["sum_days"] / count,
+            "recency_score": state["sum_recency"] / count,
+            "payment_method_count": popcount(state["payment_bits"]),
+        },
+        index=state.index,
+    )
+    features.index.name = "user_id"
+
+    users = users_df[["user_id", "age", "customer_segment"]]
+    return users.merge(features.reset_index(), on="user_id", how="inner")[
+        FEATURE_COLUMNS
+    ]
+
+
+def add_churn_labels(features, seed=None):
+    """Same rule as create_realistic_user_features, with one draw per rand() call"""
+    rng = np.random.default_rng(seed)
+    n = len(features)
+    features = features.copy()
+    features["is_churned"] = (
+        ((features["days_since_last_transaction"] > 90) & (rng.random(n) > 0.7))
+        | ((features["customer_segment"] == "Basic") & (rng.random(n) > 0.6))
+        | ((features["age"] > 60) & (rng.random(n) > 0.8))
+    )
+    return features
+
+
+def compute_user_features_local(data_dir="data", as_of=None, chunksize=5_000_000):
+    """Compute USER_FEATURES from local files in chunked, vectorized passes
+
+    Memory is bounded by one chunk plus one row of state per user, so the
+    transaction history can be far larger than RAM.
+    """
+    as_of = as_of or date.today()
+    payment_bits = PaymentMethodBits()
+
+    state = None
+    rows = 0
+    for chunk in iter_transaction_chunks(data_dir, chunksize):
+        state = merge_states(state, aggregate_chunk(chunk, as_of, payment_bits))
+        rows += len(chunk)
+        print(f"📊 Aggregated {rows:,} transactions into {len(state):,} users")
+
+    users_df = read_table(data_dir, "users", ["user_id", "age", "customer_segment"])
+    return finalize_features(state, users_df)
+
+
+def check_parity(local_df, reference_df, rtol=1e-6, atol=1e-6):
+    """Compare two USER_FEATURES frames column by column; returns mismatch counts
+
+    Snowflake returns averages as fixed-scale NUMBER (6 decimals here), so
+    the tolerance is loose enough for that rounding.
+    """
+    local_df = local_df.copy()
+    reference_df = reference_df.copy()
+    local_df.columns = [column.lower() for column in local_df.columns]
+    reference_df.columns = [column.lower() for column in reference_df.columns]
+
+    merged = local_df.merge(
+        reference_df,
+        on="user_id",
+        how="outer",
+        suffixes=("_local", "_ref"),
+        indicator=True,
+    )
+    mismatches = {"missing_rows": int((merged["_merge"] != "both").sum())}
+    for column in FEATURE_COLUMNS[1:]:
+        left = merged[f"{column}_local"]
+        right = merged[f"{column}_ref"]
+        if pd.api.types.is_numeric_dtype(left) and pd.api.types.is_numeric_dtype(right):
+            equal = np.isclose(
+                left.astype(float), right.astype(float), rtol=rtol, atol=atol
+            )
+        else:
+            equal = (left == right).to_numpy()
+        mismatches[column] = int((~equal).sum())
+    return mismatches
+
+
+def snowpark_reference(session):
+    """The warehouse definition of the same columns, for check_parity"""
+    from data_transformation import build_user_features
+
+    return build_user_features(session).to_pandas()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compute USER_FEATURES locally from the files in data/"
+    )
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--output", default="data/user_features.parquet")
+    parser.add_argument("--chunksize", type=int, default=5_000_000)
+    parser.add_argument("--as-of", type=date.fromisoformat, help="defaults to today")
+    parser.add_argument("--seed", type=int, help="seed for the churn labels")
+    parser.add_argument(
+        "--parity",
+        action="store_true",
+        help="compare against the Snowpark definition (needs a Snowflake session)",
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    features = compute_user_features_local(args.data_dir, args.as_of, args.chunksize)
+    print(
+        f"✅ Computed features for {len(features):,} users in {time.perf_counter() - start:.1f}s"
+    )
+
+    add_churn_labels(features, args.seed).to_parquet(args.output, index=False)
+    print(f"💾 Saved features to {args.output}")
+
+    if args.parity:
+        from data_transformation import create_session
+
+        session = create_session()
+        try:
+            mismatches = check_parity(features, snowpark_reference(session))
+        finally:
+            session.close()
+        print(f"🔍 Parity mismatches: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+SKIPPED = "skipped"
+# Inputs match the last successful run, so the stage did not run again
+UP_TO_DATE = "up-to-date"
+DONE = (SUCCEEDED, UP_TO_DATE)
+STATE_PATH = ".pipeline_state.json"
+
+
+class Stage:
+    """One pipeline step: a callable plus the named artifacts it reads and writes
+
+    Dependencies are not listed directly; a stage runs after every stage that
+    outputs one of its inputs. Inputs nobody outputs are external sources.
+
+    fingerprint, if given, returns JSON-serializable identities of everything
+    the stage reads (file hashes, table change tokens, code, parameters). It
+    is called when the stage is due, and the stage is skipped when the result
+    matches its last successful run.
+    """
+
+    def __init__(
+        self,
+        name,
+        run,
+        inputs=(),
+        outputs=(),
+        retries=2,
+        backoff=30.0,
+        fingerprint=None,
+    ):
+        self.name = name
+        self.run = run
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.retries = retries
+        self.backoff = backoff
+        self.fingerprint = fingerprint
+
+
+def digest(value):
+    """Short stable hash of any JSON-serializable value"""
+    encoded = json.dumps(value, sort_keys=True, default=str).encode()
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+def file_digest(*paths):
+    """Hash of the files' contents, e.g. the source code a stage runs"""
+    content = hashlib.blake2b(digest_size=16)
+    for path in paths:
+        with open(path, "rb") as f:
+            content.update(f.read())
+    return content.hexdigest()
+
+
+def load_state(path=STATE_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _save_state(path, state):
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def stage_dependencies(stages):
+    """{stage name: names of the stages producing its inputs}, checked for cycles"""
+    producers = {}
+    for stage in stages:
+        for output in stage.outputs:
+            if output in producers:
+                raise ValueError(
+                    f"{output!r} is output by both {producers[output]} and {stage.name}"
+                )
+            producers[output] = stage.name
+    dependencies = {
+        stage.name: {producers[i] for i in stage.inputs if i in producers}
+        for stage in stages
+    }
+
+    # Kahn's algorithm: anything left unordered sits on a cycle
+    remaining = {name: set(deps) for name, deps in dependencies.items()}
+    while remaining:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError(f"Stages form a cycle: {sorted(remaining)}")
+        for name in ready:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    return dependencies
+
+
+def _run_with_retries(stage, sleep=time.sleep):
+    """Run a stage, retrying with exponential backoff; returns its result record"""
+    start = time.perf_counter()
+    for attempt in range(1, stage.retries + 2):
+        try:
+            value = stage.run()
+            return {
+                "status": SUCCEEDED,
+                "attempts": attempt,
+                "seconds": time.perf_counter() - start,
+                "value": value,
+            }
+        except Exception as e:
+            if attempt > stage.retries:
+                logger.error(f"Stage {stage.name} failed after {attempt} attempts: {e}")
+                return {
+                    "status": FAILED,
+                    "attempts": attempt,
+                    "seconds": time.perf_counter() - start,
+                    "error": str(e),
+                }
+            delay = stage.backoff * 2 ** (attempt - 1)
+            logger.warning(
+                f"Stage {stage.name} failed (attempt {attempt}): {e}; "
+                f"retrying in {delay:.0f}s"
+            )
+            sleep(delay)
+
+
+def _run_stage(stage, previous):
+    """Skip the stage if its fingerprint matches previous, else run it"""
+    fingerprint = None
+    if stage.fingerprint is not None:
+        start = time.perf_counter()
+        try:
+            fingerprint = digest(stage.fingerprint())
+        except Exception as e:
+            logger.warning(f"Could not fingerprint {stage.name}, running it: {e}")
+        if fingerprint is not None and fingerprint == previous:
+            return {"status": UP_TO_DATE, "seconds": time.perf_counter() - start}
+    result = _run_with_retries(stage)
+    result["fingerprint"] = fingerprint
+    return result
+
+
+def critical_path_seconds(dependencies, results):
+    """Longest chain of dependent stage run times"""
+    finish = {}
+
+    def longest(name):
+        if name not in finish:
+            finish[name] = results[name].get("seconds", 0.0) + max(
+                (longest(dep) for dep in dependencies[name]), default=0.0
+            )
+        return finish[name]
+
+    return max((longest(name) for name in dependencies), default=0.0)
+
+
+def run_dag(stages, max_workers=4, state_path=None, force=False):
+    """Run stages as soon as their inputs are ready, independent ones concurrently
+
+    Stages run on a thread pool (they mostly wait on Snowflake or start their
+    own process pools). A stage that still fails after its retries only
+    skips the stages downstream of it; unrelated branches carry on. Returns
+    {stage name: result record} with status, attempts, seconds and value or
+    error.
+
+    With state_path, each successful stage's fingerprint is checkpointed
+    there, and stages whose fingerprint is unchanged are not run again
+    (unless force).
+    """
+    dependencies = stage_dependencies(stages)
+    by_name = {stage.name: stage for stage in stages}
+    state = load_state(state_path) if state_path else {}
+    results = {}
+    running = {}
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while len(results) < len(stages):
+            for name, deps in dependencies.items():
+                if name in results or name in running.values():
+                    continue
+                if any(
+                    results.get(dep, {}).get("status") in (FAILED, SKIPPED)
+                    for dep in deps
+                ):
+                    failed = sorted(
+                        dep for dep in deps if results[dep]["status"] not in DONE
+                    )
+                    logger.warning(
+                        f"Skipping {name}: upstream {failed} did not succeed"
+                    )
+                    results[name] = {"status": SKIPPED, "upstream": failed}
+                elif all(dep in results for dep in deps):
+                    logger.info(f"▶️ Starting stage {name}")
+                    previous = None if force else state.get(name, {}).get("fingerprint")
+                    running[pool.submit(_run_stage, by_name[name], previous)] = name
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                results[name] = result = future.result()
+                logger.info(
+                    f"{'✅' if result['status'] in DONE else '❌'} "
+                    f"Stage {name} {result['status']} in {result['seconds']:.1f}s"
+                )
+                if state_path and result["status"] == SUCCEEDED:
+                    state[name] = {
+                        "fingerprint": result["fingerprint"],
+                        "completed_at": datetime.now().isoformat(timespec="seconds"),
+                    }
+                    _save_state(state_path, state)
+
+    wall = time.perf_counter() - start
+    total = sum(result.get("seconds", 0.0) for result in results.values())
+    logger.info(
+        f"🏁 Pipeline finished in {wall:.1f}s "
+        f"(critical path {critical_path_seconds(dependencies, results):.1f}s, "
+        f"sum of stages {total:.1f}s)"
+    )
+    return results
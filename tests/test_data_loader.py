@@ -0,0 +1,110 @@
+import gzip
+import os
+import sys
+
+sys.path.append(
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data_generation"
+    )
+)
+import pytest
+
+from data_loader import (
+    TABLES,
+    RecordingConnection,
+    load_data_to_snowflake,
+    load_incremental_data,
+    load_manifest,
+)
+
+
+def write_part(data_dir, table, index, rows):
+    header = ",".join(name for name, _ in TABLES[table]["columns"])
+    path = os.path.join(data_dir, f"{table}_part{index:05d}.csv.gz")
+    with gzip.open(path, "wt") as f:
+        f.write("\n".join([header] + rows) + "\n")
+    return path
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    write_part(tmp_path, "users", 0, ["1,a@x.com,A,B,2024-01-01,US,30,Basic"])
+    write_part(tmp_path, "products", 0, ["1,Widget,Tools,9.99,Acme"])
+    for index in range(2):
+        write_part(
+            tmp_path,
+            "transactions",
+            index,
+            [f"{index + 1},1,1,1,9.99,9.99,2024-02-01 10:00:00,Card"],
+        )
+    return str(tmp_path)
+
+
+def statements_starting(conn, prefix):
+    return [s for s in conn.statements if s.startswith(prefix)]
+
+
+def test_full_load_puts_parts_in_parallel_and_copies_by_pattern(data_dir):
+    conn = RecordingConnection()
+    load_data_to_snowflake(data_dir, put_parallel=4, conn=conn)
+
+    puts = statements_starting(conn, "PUT")
+    # One wildcard PUT per table covers all of its part files
+    assert len(puts) == 3
+    transactions_put = next(s for s in puts if "/transactions/" in s)
+    assert "transactions_part*.csv.gz" in transactions_put
+    assert "PARALLEL=4" in transactions_put
+
+    copies = statements_starting(conn, "COPY INTO")
+    assert len(copies) == 3
+    assert all("PATTERN = '.*[.]csv[.](gz|zst)'" in s for s in copies)
+    assert len(statements_starting(conn, "CREATE OR REPLACE TABLE")) == 3
+
+    manifest = load_manifest(data_dir)
+    assert len(manifest) == 4
+    assert all(entry["loaded"] for entry in manifest.values())
+
+
+def test_incremental_load_copies_new_files_and_merges_keyed_tables(data_dir):
+    load_data_to_snowflake(data_dir, conn=RecordingConnection())
+    write_part(data_dir, "transactions", 2, ["3,1,1,2,9.99,19.98,2024-03-01,Card"])
+    write_part(data_dir, "users", 1, ["1,new@x.com,A,B,2024-01-01,US,31,Premium"])
+
+    conn = RecordingConnection()
+    rows = load_incremental_data(data_dir, put_parallel=2, conn=conn)
+    assert rows == {"users": 1, "transactions": 1}
+
+    puts = statements_starting(conn, "PUT")
+    assert len(puts) == 2
+    assert all("PARALLEL=2" in s for s in puts)
+    assert any(
+        s.startswith("PUT file://") and "transactions_part00002" in s for s in puts
+    )
+
+    copies = statements_starting(conn, "COPY INTO")
+    transactions_copy = next(s for s in copies if "raw_transactions" in s)
+    assert "FILES = ('transactions_part00002.csv.gz')" in transactions_copy
+    users_copy = next(s for s in copies if "raw_users_delta" in s)
+    assert "FILES = ('users_part00001.csv.gz')" in users_copy
+    assert "METADATA$FILENAME" in users_copy
+
+    merges = statements_starting(conn, "MERGE INTO")
+    assert len(merges) == 1
+    assert merges[0].startswith("MERGE INTO RAW_DATA.raw_users t")
+    assert "ORDER BY source_file DESC, source_row DESC" in merges[0]
+    # Transactions are appended, and unchanged products are not touched
+    assert not any("raw_products" in s for s in conn.statements)
+
+    conn = RecordingConnection()
+    assert load_incremental_data(data_dir, conn=conn) == {}
+    assert conn.statements == []
+
+
+def test_incremental_load_refuses_rewritten_append_only_files(data_dir):
+    load_data_to_snowflake(data_dir, conn=RecordingConnection())
+    write_part(data_dir, "transactions", 0, ["1,1,1,5,9.99,49.95,2024-02-01,Card"])
+
+    conn = RecordingConnection()
+    with pytest.raises(ValueError, match="transactions_part00000"):
+        load_incremental_data(data_dir, conn=conn)
+    assert conn.statements == []
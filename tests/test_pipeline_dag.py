@@ -0,0 +1,116 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
+
+from pipeline_dag import (
+    FAILED,
+    SKIPPED,
+    SUCCEEDED,
+    UP_TO_DATE,
+    Stage,
+    run_dag,
+    stage_dependencies,
+)
+
+
+def noop():
+    return None
+
+
+def fail():
+    raise RuntimeError("boom")
+
+
+def test_stage_dependencies_follow_artifacts():
+    stages = [
+        Stage("load", noop, outputs=["raw"]),
+        Stage("features", noop, inputs=["raw", "external"], outputs=["features"]),
+        Stage("train", noop, inputs=["features"]),
+    ]
+    assert stage_dependencies(stages) == {
+        "load": set(),
+        "features": {"load"},
+        "train": {"features"},
+    }
+
+
+def test_stage_dependencies_reject_cycle():
+    stages = [
+        Stage("a", noop, inputs=["y"], outputs=["x"]),
+        Stage("b", noop, inputs=["x"], outputs=["y"]),
+        Stage("c", noop, outputs=["z"]),
+    ]
+    with pytest.raises(ValueError, match="cycle"):
+        stage_dependencies(stages)
+
+
+def test_stage_dependencies_reject_duplicate_producer():
+    stages = [Stage("a", noop, outputs=["x"]), Stage("b", noop, outputs=["x"])]
+    with pytest.raises(ValueError, match="output by both"):
+        stage_dependencies(stages)
+
+
+def test_failure_skips_only_its_downstream_branch():
+    stages = [
+        Stage("load", noop, outputs=["raw"]),
+        Stage("train", fail, inputs=["raw"], outputs=["model"], retries=0),
+        Stage("deploy", noop, inputs=["model"], outputs=["udfs"]),
+        Stage("report", noop, inputs=["udfs"]),
+        Stage("score", noop, inputs=["raw"]),
+    ]
+    results = run_dag(stages)
+    assert results["load"]["status"] == SUCCEEDED
+    assert results["train"]["status"] == FAILED
+    assert results["deploy"] == {"status": SKIPPED, "upstream": ["train"]}
+    assert results["report"] == {"status": SKIPPED, "upstream": ["deploy"]}
+    assert results["score"]["status"] == SUCCEEDED
+
+
+def test_retry_recovers():
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise RuntimeError("transient")
+        return "ok"
+
+    results = run_dag([Stage("flaky", flaky, retries=2, backoff=0)])
+    assert results["flaky"]["status"] == SUCCEEDED
+    assert results["flaky"]["attempts"] == 3
+    assert results["flaky"]["value"] == "ok"
+
+
+def test_unchanged_fingerprint_is_up_to_date(tmp_path):
+    state_path = str(tmp_path / "state.json")
+    calls = []
+    source = {"version": 1}
+
+    def build():
+        calls.append(1)
+
+    stages = [
+        Stage("build", build, outputs=["out"], fingerprint=lambda: dict(source)),
+        Stage("use", noop, inputs=["out"], fingerprint=lambda: {}),
+    ]
+
+    assert run_dag(stages, state_path=state_path)["build"]["status"] == SUCCEEDED
+    results = run_dag(stages, state_path=state_path)
+    assert results["build"]["status"] == UP_TO_DATE
+    assert results["use"]["status"] == UP_TO_DATE
+    assert len(calls) == 1
+
+    source["version"] = 2
+    assert run_dag(stages, state_path=state_path)["build"]["status"] == SUCCEEDED
+    forced = run_dag(stages, state_path=state_path, force=True)
+    assert forced["build"]["status"] == SUCCEEDED
+    assert len(calls) == 3
+
+
+def test_failed_stage_is_not_checkpointed(tmp_path):
+    state_path = str(tmp_path / "state.json")
+    stages = [Stage("train", fail, retries=0, fingerprint=lambda: {"week": 1})]
+    run_dag(stages, state_path=state_path)
+    assert run_dag(stages, state_path=state_path)["train"]["status"] == FAILED